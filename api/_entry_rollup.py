@@ -0,0 +1,205 @@
+"""
+Estadísticas de entradas (victorias, derrotas, rachas, status, semana de
+eliminación) a partir de sus picks.
+
+compute_entry_stats reproduce toda la temporada de una entrada. Para no
+repetirlo en cada corrida, cada entrada guarda además su estado de rollup:
+  * win_run: victorias desde la última derrota (un empate no la corta), base
+    de longest_streak
+  * last_scored_week: semana del último pick con resultado aplicado
+Con ese estado, apply_new_results suma solo los picks recién calificados. Si un
+pick ya calificado cambia de resultado, llega un pick anterior a
+last_scored_week o la entrada no tiene estado, la entrada se reproduce completa.
+Las mismas reglas viven en la función score_season_picks de Postgres.
+"""
+
+ENTRY_STAT_FIELDS = ("total_wins", "total_losses", "longest_streak", "current_streak", "status", "eliminated_week", "is_active")
+ENTRY_ROLLUP_FIELDS = ("win_run", "last_scored_week")
+
+WIN_RESULTS = ('W', 'win')
+LOSS_RESULTS = ('L', 'loss')
+TIE_RESULTS = ('T', 'draw')
+RESOLVED_RESULTS = WIN_RESULTS + LOSS_RESULTS + TIE_RESULTS
+
+
+def pick_order(pick):
+    """Orden de reproducción: semana y luego id (igual que en Postgres)."""
+    return (int(pick['week']), pick.get('id') or 0)
+
+
+def compute_entry_stats(picks):
+    """
+    Calcula las estadísticas de una entrada a partir de sus picks ordenados por semana.
+    Calcula: total_wins, total_losses, longest_streak, current_streak, status, eliminated_week
+    y el estado de rollup (win_run, last_scored_week).
+    """
+    total_wins = 0
+    total_losses = 0
+    longest_streak = 0
+    temp_streak = 0
+    status = "alive"
+    eliminated_week = None
+    loss_count = 0
+
+    for pick in picks:
+        result = pick.get('result')
+        week = pick.get('week')
+
+        # Normalizar valores antiguos y nuevos
+        if result in WIN_RESULTS:
+            total_wins += 1
+            temp_streak += 1
+            longest_streak = max(longest_streak, temp_streak)
+        elif result in LOSS_RESULTS:
+            total_losses += 1
+            loss_count += 1
+            temp_streak = 0  # Reset streak on loss
+
+            # Lógica de eliminación
+            if loss_count == 1:
+                status = "last_chance"
+            elif loss_count >= 2:
+                status = "eliminated"
+                eliminated_week = week
+                break  # No procesar más picks después de eliminación
+        elif result in TIE_RESULTS:
+            # Empate no afecta racha pero tampoco la resetea
+            pass
+        # Si result es None o 'pending', no afecta las estadísticas
+
+    # Current streak es la racha actual (solo si la última decisión fue victoria)
+    current_streak = 0
+    # Contar victorias consecutivas desde el final
+    for pick in reversed(picks):
+        if pick.get('result') in WIN_RESULTS:
+            current_streak += 1
+        elif pick.get('result') in LOSS_RESULTS + TIE_RESULTS:
+            break
+
+    # Los picks posteriores a la eliminación también cuentan para current_streak
+    resolved_weeks = [pick.get('week') for pick in picks if pick.get('result') in RESOLVED_RESULTS]
+
+    return {
+        "total_wins": total_wins,
+        "total_losses": total_losses,
+        "longest_streak": longest_streak,
+        "current_streak": current_streak,
+        "status": status,
+        "eliminated_week": eliminated_week,
+        "is_active": status != "eliminated",
+        "win_run": temp_streak,
+        "last_scored_week": resolved_weeks[-1] if resolved_weeks else None
+    }
+
+
+def apply_new_results(entry, picks):
+    """
+    Aplica picks recién calificados (ordenados con pick_order) sobre las
+    estadísticas guardadas de la entrada. Regresa las estadísticas nuevas, o
+    None si la entrada se tiene que reproducir completa.
+    """
+    if entry.get('win_run') is None or any(entry.get(field) is None for field in ENTRY_STAT_FIELDS if field != 'eliminated_week'):
+        return None
+    stats = {field: entry.get(field) for field in ENTRY_STAT_FIELDS + ENTRY_ROLLUP_FIELDS}
+
+    for pick in picks:
+        result = pick.get('result')
+        week = pick.get('week')
+        if result not in RESOLVED_RESULTS:
+            continue
+        if stats['last_scored_week'] is not None and int(week) <= int(stats['last_scored_week']):
+            # Fuera de orden: cambiaría rachas ya calculadas
+            return None
+        stats['last_scored_week'] = week
+        eliminated = stats['status'] == "eliminated"
+
+        if result in WIN_RESULTS:
+            stats['current_streak'] += 1
+            if not eliminated:
+                stats['total_wins'] += 1
+                stats['win_run'] += 1
+                stats['longest_streak'] = max(stats['longest_streak'], stats['win_run'])
+        elif result in LOSS_RESULTS:
+            stats['current_streak'] = 0
+            if not eliminated:
+                stats['total_losses'] += 1
+                stats['win_run'] = 0
+                if stats['total_losses'] == 1:
+                    stats['status'] = "last_chance"
+                else:
+                    stats['status'] = "eliminated"
+                    stats['eliminated_week'] = week
+        else:
+            stats['current_streak'] = 0
+
+    stats['is_active'] = stats['status'] != "eliminated"
+    return stats
+
+
+def rollup_entries(entries, pick_results, load_picks, track_state=True):
+    """
+    Calcula las estadísticas nuevas de las entradas. pick_results son los picks
+    calificados en la corrida (dicts con id, entry_id, week, previous y result).
+    load_picks(entry_ids) regresa {entry_id: [picks]} para las que se reproducen.
+    Con track_state=False (columnas de rollup sin migrar) solo se reproducen las
+    entradas con picks que cambiaron y no se escribe el estado.
+
+    Las entradas se escriben antes que los picks, así una corrida que falla a
+    la mitad deja los mismos cambios de picks para la siguiente (que reproduce
+    las entradas ya escritas). Un pick sin cambio con semana posterior a
+    last_scored_week también se aplica: cubre picks escritos sin actualizar su
+    entrada (p. ej. una auditoría interrumpida).
+
+    Regresa (filas_que_cambian, ids_reproducidos); cada fila trae solo el id y
+    las columnas de estadísticas.
+    """
+    candidates = {}
+    replay_ids = set()
+    for pick in pick_results:
+        entry_id = pick['entry_id']
+        previous, result = pick.get('previous'), pick.get('result')
+        if previous != result and previous in RESOLVED_RESULTS:
+            # Un pick ya calificado cambió (corrección de marcador): reproducir
+            replay_ids.add(entry_id)
+        elif result in RESOLVED_RESULTS and (track_state or previous != result):
+            candidates.setdefault(entry_id, []).append(pick)
+
+    stats_by_entry = {}
+    for entry in entries:
+        entry_id = entry['id']
+        if entry_id in replay_ids or entry_id not in candidates:
+            continue
+        if not track_state:
+            replay_ids.add(entry_id)
+            continue
+        last_week = entry.get('last_scored_week')
+        new_picks = [
+            pick for pick in candidates[entry_id]
+            if pick.get('previous') != pick.get('result') or last_week is None or int(pick['week']) > int(last_week)
+        ]
+        if not new_picks:
+            continue
+        stats = apply_new_results(entry, sorted(new_picks, key=pick_order))
+        if stats is None:
+            replay_ids.add(entry_id)
+        else:
+            stats_by_entry[entry_id] = stats
+
+    replay_ids &= {entry['id'] for entry in entries}
+    if replay_ids:
+        # Las entradas se escriben antes que los picks: sobreponer los resultados nuevos
+        results = {pick['id']: pick.get('result') for pick in pick_results}
+        picks_by_entry = load_picks(sorted(replay_ids))
+        for entry_id in replay_ids:
+            picks = [dict(pick, result=results[pick['id']]) if pick.get('id') in results else pick
+                     for pick in picks_by_entry.get(entry_id, [])]
+            stats_by_entry[entry_id] = compute_entry_stats(sorted(picks, key=pick_order))
+
+    fields = ENTRY_STAT_FIELDS + ENTRY_ROLLUP_FIELDS if track_state else ENTRY_STAT_FIELDS
+    changed = []
+    for entry in entries:
+        stats = stats_by_entry.get(entry['id'])
+        if stats is None or all(entry.get(field) == stats[field] for field in fields):
+            continue
+        changed.append({"id": entry['id'], **{field: stats[field] for field in fields}})
+    return changed, replay_ids
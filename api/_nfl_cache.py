@@ -0,0 +1,175 @@
+"""
+Cache del payload completo de /nfl-events por año.
+
+update_matches, update_weekly_odds, update_matches_by_year y test_api leen
+todos de la misma copia; solo se vuelve a descargar cuando expira el TTL o
+cuando se invalida explícitamente. Opcionalmente se guarda en disco (ej. /tmp
+en Vercel) para sobrevivir entre invocaciones del mismo contenedor.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EVENTS_TTL = 600  # segundos
+DEFAULT_EVENTS_MAX_STALE = 600  # segundos que una copia vencida se puede servir si la descarga falla
+
+
+class SeasonEventsCache:
+    """
+    Cache en memoria (y opcionalmente en disco) de /nfl-events?year=.
+    Los datos cacheados se comparten entre endpoints: no deben modificarse.
+    """
+
+    def __init__(self, client, ttl_seconds=DEFAULT_EVENTS_TTL, disk_dir=None, streaming=False,
+                 max_stale_seconds=DEFAULT_EVENTS_MAX_STALE):
+        self.client = client
+        # En modo streaming se guardan eventos compactos en lugar del JSON crudo
+        self.streaming = streaming
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.disk_dir = disk_dir
+        self._entries = {}  # year -> (fetched_at, data)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+
+    def _disk_path(self, year):
+        return os.path.join(self.disk_dir, f"nfl_events_{year}.json")
+
+    def _is_fresh(self, fetched_at):
+        return (time.time() - fetched_at) < self.ttl_seconds
+
+    def _read_disk(self, year, allow_stale=False):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(year)
+        try:
+            fetched_at = os.path.getmtime(path)
+            if not allow_stale and not self._is_fresh(fetched_at):
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                return fetched_at, json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo leer cache de eventos en disco ({path}): {e}")
+            return None
+
+    def _write_disk(self, year, data):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(year)
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo escribir cache de eventos en disco ({path}): {e}")
+
+    def age(self, year):
+        """Segundos desde la descarga de la copia vigente en memoria del año (None si no hay)."""
+        with self._lock:
+            entry = self._entries.get(year)
+            if entry is None or not self._is_fresh(entry[0]):
+                return None
+            return round(time.time() - entry[0], 1)
+
+    def get(self, year, refresh=False, allow_stale=True):
+        """
+        Regresa el JSON de /nfl-events para el año.
+        Si la descarga falla pero hay una copia vencida hace no más de
+        max_stale_seconds, se regresa una copia superficial con "stale": True y
+        "age_seconds" en lugar de fallar. Sin esa copia o con allow_stale=False
+        (caminos que escriben en la BD) se propaga el error (ej. HTTPError).
+        """
+        if not refresh:
+            with self._lock:
+                entry = self._entries.get(year)
+                if entry and self._is_fresh(entry[0]):
+                    self.hits += 1
+                    return entry[1]
+
+            disk_entry = self._read_disk(year)
+            if disk_entry:
+                with self._lock:
+                    self._entries[year] = disk_entry
+                    self.disk_hits += 1
+                logger.info(f"📦 Eventos {year} cargados desde cache en disco")
+                return disk_entry[1]
+
+        with self._lock:
+            self.misses += 1
+        logger.info(f"📡 Descargando /nfl-events para {year} (cache miss)")
+        try:
+            data = self.client.events_compact(year) if self.streaming else self.client.events(year)
+        except Exception as e:
+            with self._lock:
+                entry = self._entries.get(year)
+            entry = entry or self._read_disk(year, allow_stale=True)
+            if not entry or not allow_stale:
+                raise
+            age_seconds = round(time.time() - entry[0], 1)
+            if self.max_stale_seconds is not None and age_seconds > self.ttl_seconds + self.max_stale_seconds:
+                logger.warning(f"⚠️ Error descargando eventos {year} ({e}); la copia vencida es demasiado vieja ({age_seconds}s)")
+                raise
+            with self._lock:
+                self.stale_hits += 1
+            logger.warning(f"⚠️ Error descargando eventos {year} ({e}); usando copia vencida de hace {age_seconds}s")
+            return {**entry[1], "stale": True, "age_seconds": age_seconds}
+
+        fetched_at = time.time()
+        with self._lock:
+            self._entries[year] = (fetched_at, data)
+        self._write_disk(year, data)
+        return data
+
+    def invalidate(self, year=None):
+        """Elimina la copia de un año (o de todos si year es None)."""
+        with self._lock:
+            years = [year] if year is not None else list(self._entries.keys())
+            for y in years:
+                self._entries.pop(y, None)
+        if self.disk_dir:
+            if year is None and os.path.isdir(self.disk_dir):
+                for name in os.listdir(self.disk_dir):
+                    if name.startswith("nfl_events_") and name.endswith(".json"):
+                        y = name[len("nfl_events_"):-len(".json")]
+                        y = int(y) if y.isdigit() else y
+                        if y not in years:
+                            years.append(y)
+            for y in years:
+                try:
+                    os.remove(self._disk_path(y))
+                except FileNotFoundError:
+                    pass
+        return years
+
+    def stats(self):
+        with self._lock:
+            now = time.time()
+            return {
+                "ttl_seconds": self.ttl_seconds,
+                "max_stale_seconds": self.max_stale_seconds,
+                "streaming": self.streaming,
+                "disk_dir": self.disk_dir,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+                "years": {
+                    str(year): {
+                        "age_seconds": round(now - fetched_at, 1),
+                        "fresh": self._is_fresh(fetched_at),
+                        "events": len(data.get('events', [])) if isinstance(data, dict) else 0
+                    }
+                    for year, (fetched_at, data) in self._entries.items()
+                }
+            }
@@ -0,0 +1,407 @@
+"""
+Cliente compartido para NFL API Data (RapidAPI).
+
+Todas las llamadas a nfl-api-data.p.rapidapi.com pasan por una sola
+requests.Session con pool de conexiones y keep-alive, para no pagar un
+handshake TCP+TLS nuevo en cada request (loop de live scores, 32 récords
+de equipos, etc.).
+"""
+import logging
+import threading
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures import TimeoutError as FuturesTimeout
+from requests.adapters import HTTPAdapter
+from _nfl_events import parse_events_stream
+from _resilience import LatencyTracker, CircuitBreaker, CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+RAPIDAPI_HOST = "nfl-api-data.p.rapidapi.com"
+DEFAULT_BASE_URL = f"https://{RAPIDAPI_HOST}"
+
+# Máximo de requests simultáneos en los fan-outs (récords de equipos, odds)
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Timeouts (connect, read) en segundos por endpoint
+DEFAULT_TIMEOUT = (5, 30)
+ENDPOINT_TIMEOUTS = {
+    "/nfl-events": (5, 30),
+    "/nfl-eventodds": (5, 30),
+    "/nfl-team-listing/v1/data": (5, 20),
+    "/nfl-team-record": (5, 20),
+    "/nfl-livescores": (5, 20),
+}
+
+# Endpoints idempotentes donde se lanza un segundo intento si el primero tarda más que el p95
+DEFAULT_HEDGED_ENDPOINTS = {"/nfl-livescores", "/nfl-eventodds"}
+
+# Payloads que no se guardan como "último bueno" (el de eventos ya lo guarda SeasonEventsCache)
+STALE_EXCLUDED_ENDPOINTS = {"/nfl-events"}
+
+# Edad máxima (segundos) del último payload bueno que se sirve cuando RapidAPI falla
+DEFAULT_MAX_STALE_SECONDS = 600
+
+
+def is_upstream_failure(error):
+    """Errores que indican que RapidAPI no está sano (cuentan para el circuit breaker)."""
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return True
+    if isinstance(error, requests.exceptions.HTTPError):
+        response = error.response
+        return response is not None and (response.status_code >= 500 or response.status_code == 429)
+    # JSON truncado o inválido
+    return isinstance(error, ValueError)
+
+
+class SingleFlight:
+    """
+    Agrupa llamadas idénticas concurrentes: mientras una llamada con la misma
+    llave está en vuelo, los demás hilos esperan y reciben su mismo resultado
+    (o su misma excepción) en lugar de repetir el request.
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._Call()
+                self._calls[key] = call
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls)
+            }
+
+
+class NFLClient:
+    """
+    Cliente HTTP para NFL API Data con sesión persistente.
+    Los headers de RapidAPI, gzip y keep-alive se configuran una sola vez.
+    """
+
+    def __init__(self, api_key, base_url=DEFAULT_BASE_URL, host=RAPIDAPI_HOST, pool_size=32,
+                 rate_limiter=None, max_429_retries=2, hedged_endpoints=DEFAULT_HEDGED_ENDPOINTS,
+                 serve_stale=True, max_stale_seconds=DEFAULT_MAX_STALE_SECONDS):
+        self.base_url = base_url.rstrip('/')
+        # Token bucket opcional: las llamadas esperan turno en vez de recibir 429
+        self.rate_limiter = rate_limiter
+        self.max_429_retries = max_429_retries
+        self.singleflight = SingleFlight()
+
+        # Hedged requests, circuit breaker por endpoint y último payload bueno
+        self.hedged_endpoints = set(hedged_endpoints or ())
+        self.serve_stale = serve_stale
+        self.max_stale_seconds = max_stale_seconds
+        self._latency = {}
+        self._breakers = {}
+        self._last_good = {}  # (endpoint, params) -> (payload, time.monotonic() al guardarlo)
+        self._lock = threading.Lock()
+        self._hedge_executor = None
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.stale_served = 0
+        self.session = requests.Session()
+        # Sin reintentos automáticos: cada endpoint decide cómo manejar errores
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            'X-RapidAPI-Key': api_key,
+            'X-RapidAPI-Host': host,
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive'
+        })
+
+    def url(self, endpoint):
+        return f"{self.base_url}{endpoint}"
+
+    def _tracker(self, endpoint):
+        with self._lock:
+            if endpoint not in self._latency:
+                self._latency[endpoint] = LatencyTracker()
+            return self._latency[endpoint]
+
+    def _breaker(self, endpoint):
+        with self._lock:
+            if endpoint not in self._breakers:
+                self._breakers[endpoint] = CircuitBreaker()
+            return self._breakers[endpoint]
+
+    def is_degraded(self, endpoint):
+        """True si el circuito del endpoint no está cerrado (upstream con fallas)."""
+        with self._lock:
+            breaker = self._breakers.get(endpoint)
+        return breaker.is_open() if breaker else False
+
+    def get(self, endpoint, params=None, timeout=None, stream=False, on_sent=None):
+        """
+        GET crudo sobre la sesión compartida. Regresa el Response sin validar
+        el status para que cada endpoint maneje 404/5xx como ya lo hace.
+        Con rate limiter, un 429 pausa el bucket y la llamada se reintenta
+        (hasta max_429_retries) en lugar de fallar de inmediato.
+        on_sent() se llama justo antes de enviar el request (ya con token).
+        """
+        if timeout is None:
+            timeout = ENDPOINT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT)
+
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            if on_sent:
+                on_sent()
+            started = time.monotonic()
+            response = self.session.get(self.url(endpoint), params=params, timeout=timeout, stream=stream)
+            if response.status_code < 500:
+                self._tracker(endpoint).record(time.monotonic() - started)
+            if not self.rate_limiter:
+                return response
+
+            self.rate_limiter.update_from_headers(response.headers)
+            if response.status_code != 429 or attempt >= self.max_429_retries:
+                return response
+
+            retry_after = response.headers.get('Retry-After')
+            response.close()
+            self.rate_limiter.on_throttled(float(retry_after) if retry_after and retry_after.isdigit() else None)
+            attempt += 1
+            logger.info(f"🔁 Reintentando {endpoint} después de 429 (intento {attempt}/{self.max_429_retries})")
+
+    def get_hedged(self, endpoint, params=None, timeout=None):
+        """
+        GET con hedging: si el primer intento no responde dentro del p95 observado
+        del endpoint, se lanza un segundo intento y se usa el primero que termine.
+        El tiempo cuenta desde que el primer intento sale (no incluye la espera
+        por un worker ni por el rate limiter), y no se lanza el segundo intento
+        mientras el rate limiter está encolando o pausado por un 429.
+        Solo para requests idempotentes.
+        """
+        with self._lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="nfl-hedge")
+            executor = self._hedge_executor
+
+        delay = self._tracker(endpoint).hedge_delay()
+        sent = threading.Event()
+
+        def send_primary():
+            try:
+                return self.get(endpoint, params, timeout, on_sent=sent.set)
+            finally:
+                sent.set()  # También si falla antes de enviar (ej. RateLimitExceeded)
+
+        primary = executor.submit(send_primary)
+        sent.wait()
+        try:
+            return primary.result(timeout=delay)
+        except FuturesTimeout:
+            pass
+
+        if self.rate_limiter and self.rate_limiter.is_congested():
+            # La lentitud puede ser la cola local: un segundo intento solo gastaría otro token
+            return primary.result()
+
+        with self._lock:
+            self.hedges_fired += 1
+        logger.info(f"⏱️ {endpoint}: sin respuesta en {delay:.2f}s, lanzando hedged request")
+        hedge = executor.submit(self.get, endpoint, params, timeout)
+
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._lock:
+                            self.hedges_won += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _guarded(self, endpoint, fn):
+        """Ejecuta fn respetando el circuit breaker del endpoint."""
+        breaker = self._breaker(endpoint)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuito abierto para {endpoint}: RapidAPI no está respondiendo")
+        try:
+            result = fn()
+        except Exception as e:
+            if is_upstream_failure(e):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise
+        breaker.record_success()
+        return result
+
+    def get_json(self, endpoint, params=None, timeout=None):
+        """
+        GET que lanza HTTPError si el status no es 2xx y regresa el JSON.
+        Llamadas concurrentes con el mismo (endpoint, params) comparten un solo
+        request y el mismo JSON parseado, que por lo tanto no debe modificarse.
+        Si el upstream falla o su circuito está abierto, se regresa el último
+        payload bueno de esa misma llamada si no tiene más de max_stale_seconds,
+        en lugar de fallar. Si es un dict se regresa una copia con
+        "stale": True y "age_seconds" para que el endpoint lo reporte.
+        """
+        key = (endpoint, tuple(sorted((params or {}).items())))
+
+        def fetch():
+            if endpoint in self.hedged_endpoints:
+                response = self.get_hedged(endpoint, params=params, timeout=timeout)
+            else:
+                response = self.get(endpoint, params=params, timeout=timeout)
+            response.raise_for_status()
+            return response.json()
+
+        try:
+            data = self.singleflight.do(key, lambda: self._guarded(endpoint, fetch))
+        except Exception as e:
+            if self.serve_stale and (isinstance(e, CircuitOpenError) or is_upstream_failure(e)):
+                stale = None
+                with self._lock:
+                    last_good = self._last_good.get(key)
+                    if last_good is not None:
+                        stale, stored_at = last_good
+                        age_seconds = round(time.monotonic() - stored_at, 1)
+                        if self.max_stale_seconds is not None and age_seconds > self.max_stale_seconds:
+                            stale = None
+                        else:
+                            self.stale_served += 1
+                if stale is not None:
+                    logger.warning(f"⚠️ {endpoint}: sirviendo último payload bueno de hace {age_seconds}s ({e})")
+                    if isinstance(stale, dict):
+                        return {**stale, "stale": True, "age_seconds": age_seconds}
+                    return stale
+                if last_good is not None:
+                    logger.warning(f"⚠️ {endpoint}: último payload bueno demasiado viejo ({age_seconds}s), no se sirve")
+            raise
+
+        if endpoint not in STALE_EXCLUDED_ENDPOINTS:
+            with self._lock:
+                self._last_good[key] = (data, time.monotonic())
+        return data
+
+    # --- Endpoints de NFL API Data (regresan el JSON, HTTPError si falla) ---
+
+    def events(self, year):
+        return self.get_json("/nfl-events", params={'year': year})
+
+    def events_compact(self, year, chunk_size=64 * 1024):
+        """
+        Igual que events() pero parseando la respuesta en streaming: cada evento
+        se reduce a un registro compacto mientras se lee (ver _nfl_events).
+        """
+        endpoint = "/nfl-events"
+        params = {'year': year}
+
+        def fetch():
+            response = self.get(endpoint, params=params, stream=True)
+            try:
+                response.raise_for_status()
+                return parse_events_stream(response.iter_content(chunk_size=chunk_size))
+            finally:
+                response.close()
+
+        return self.singleflight.do(
+            (endpoint, tuple(params.items()), 'compact'),
+            lambda: self._guarded(endpoint, fetch)
+        )
+
+    def event_odds(self, event_id):
+        return self.get_json("/nfl-eventodds", params={'id': event_id})
+
+    def team_listing(self):
+        return self.get_json("/nfl-team-listing/v1/data")
+
+    def team_record(self, team_id, year):
+        return self.get_json("/nfl-team-record", params={'id': team_id, 'year': year})
+
+    def live_scores(self):
+        return self.get_json("/nfl-livescores")
+
+    def stats(self):
+        with self._lock:
+            latency = dict(self._latency)
+            breakers = dict(self._breakers)
+            hedging = {
+                "endpoints": sorted(self.hedged_endpoints),
+                "fired": self.hedges_fired,
+                "won": self.hedges_won
+            }
+            stale_served = self.stale_served
+        return {
+            "singleflight": self.singleflight.stats(),
+            "rate_limiter": self.rate_limiter.status() if self.rate_limiter else None,
+            "latency": {endpoint: tracker.stats() for endpoint, tracker in latency.items()},
+            "circuit_breakers": {endpoint: breaker.stats() for endpoint, breaker in breakers.items()},
+            "hedging": hedging,
+            "stale_served": stale_served,
+            "max_stale_seconds": self.max_stale_seconds
+        }
+
+    def close(self):
+        if self._hedge_executor:
+            self._hedge_executor.shutdown(wait=False)
+        self.session.close()
+
+
+def fan_out(fn, items, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+    """
+    Ejecuta fn(item) en paralelo con un máximo de max_concurrency hilos.
+    Regresa una lista de (item, resultado, error) en el mismo orden que items;
+    si fn falla para un item, el error queda en su tupla y los demás siguen.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    def run(item):
+        try:
+            return item, fn(item), None
+        except Exception as e:
+            return item, None, e
+
+    workers = max(1, min(max_concurrency, len(items)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run, items))
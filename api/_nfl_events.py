@@ -0,0 +1,163 @@
+"""
+Parseo incremental del payload de /nfl-events.
+
+El documento de la temporada completa pesa varios MB; en lugar de hacer
+response.json() y quedarse con cada evento crudo, se recorre 'events[]'
+elemento por elemento mientras llega la respuesta y cada evento se reduce a
+los campos que usan los endpoints (fecha, semana, temporada, competidores,
+marcadores y status). La forma anidada se conserva para que update_matches y
+update_weekly_odds lean los registros compactos igual que los crudos.
+"""
+import codecs
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+# Campos del equipo que se conservan en cada competidor
+TEAM_FIELDS = ('id', 'abbreviation', 'location', 'name', 'displayName', 'shortDisplayName')
+
+
+class _ChunkReader:
+    """Buffer de texto que se llena con chunks y se recorta al consumirlo."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.buf = ""
+        self.pos = 0
+        self.exhausted = False
+
+    def fill(self):
+        """Agrega el siguiente chunk; regresa False si ya no hay más."""
+        if self.exhausted:
+            return False
+        for chunk in self._chunks:
+            if chunk:
+                if isinstance(chunk, bytes):
+                    chunk = self._utf8.decode(chunk)
+                # Descartar lo ya consumido para no acumular el documento completo
+                self.buf = self.buf[self.pos:] + chunk
+                self.pos = 0
+                return True
+        self.exhausted = True
+        return False
+
+    def peek(self):
+        """Siguiente carácter no-blanco (sin consumirlo), o '' al final."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"JSON inválido: se esperaba '{char}' en la posición {self.pos}")
+        self.pos += 1
+
+    def decode_value(self):
+        """Decodifica un valor JSON completo, leyendo más chunks si hace falta."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+                # Un número al final del buffer podría continuar en el siguiente chunk
+                if end < len(self.buf) or self.exhausted:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.exhausted:
+                    raise
+            if not self.fill():
+                self.exhausted = True
+
+
+def iter_array_items(chunks, array_key, on_other_key=None):
+    """
+    Recorre un objeto JSON de nivel superior y produce uno a uno los elementos
+    del arreglo 'array_key'. Los demás valores de nivel superior se pasan a
+    on_other_key(key, value) si se proporciona.
+    """
+    reader = _ChunkReader(chunks)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        key = reader.decode_value()
+        reader.expect(':')
+        if key == array_key and reader.peek() == '[':
+            reader.expect('[')
+            if reader.peek() == ']':
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.decode_value()
+                    nxt = reader.peek()
+                    reader.pos += 1
+                    if nxt == ']':
+                        break
+                    if nxt != ',':
+                        raise ValueError(f"JSON inválido en '{array_key}': se esperaba ',' o ']'")
+        else:
+            value = reader.decode_value()
+            if on_other_key:
+                on_other_key(key, value)
+        nxt = reader.peek()
+        reader.pos += 1
+        if nxt == '}':
+            return
+        if nxt != ',':
+            raise ValueError("JSON inválido: se esperaba ',' o '}'")
+
+
+def compact_event(event):
+    """Reduce un evento crudo a los campos usados por los endpoints, con la misma forma anidada."""
+    season = event.get('season') or {}
+    week = event.get('week') or {}
+    competitions = event.get('competitions') or []
+
+    compact_competitions = []
+    if competitions:
+        competition = competitions[0]
+        status_type = ((competition.get('status') or {}).get('type') or {})
+        competitors = []
+        for comp in competition.get('competitors') or []:
+            team = comp.get('team') or {}
+            competitors.append({
+                'homeAway': comp.get('homeAway'),
+                'score': comp.get('score'),
+                'team': {field: team.get(field) for field in TEAM_FIELDS if field in team}
+            })
+        compact_competitions.append({
+            'competitors': competitors,
+            'status': {'type': {
+                'completed': status_type.get('completed', False),
+                'state': status_type.get('state'),
+                'name': status_type.get('name')
+            }}
+        })
+
+    return {
+        'id': event.get('id'),
+        'date': event.get('date'),
+        'season': {'year': season.get('year'), 'type': season.get('type')},
+        'week': {'number': week.get('number')},
+        'competitions': compact_competitions
+    }
+
+
+def parse_events_stream(chunks):
+    """
+    Parsea incrementalmente un documento de /nfl-events y regresa
+    {'events': [eventos compactos], ...demás claves de nivel superior}.
+    """
+    document = {}
+
+    def keep_other(key, value):
+        document[key] = value
+
+    document['events'] = [compact_event(event) for event in iter_array_items(chunks, 'events', keep_other)]
+    return document
@@ -0,0 +1,177 @@
+"""
+Rate limiter tipo token bucket para RapidAPI.
+
+Las llamadas esperan su turno en lugar de fallar: cada request toma un token
+del bucket (que se rellena a 'rate_per_second') y, si la API regresa 429, el
+bucket se pausa según Retry-After y baja su ritmo temporalmente. Los headers
+X-RateLimit-* de cada respuesta actualizan la cuota mensual restante.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE_PER_SECOND = 5.0
+DEFAULT_MAX_WAIT = 30.0  # segundos máximos que una llamada espera en cola
+MIN_RATE_PER_SECOND = 0.5
+
+
+class RateLimitExceeded(Exception):
+    """La llamada no puede hacerse sin exceder el plan de RapidAPI."""
+
+
+def _next_month_start(timestamp):
+    """Inicio (UTC) del mes siguiente: reset supuesto de la cuota si RapidAPI no lo informa."""
+    now = datetime.fromtimestamp(timestamp, timezone.utc)
+    year, month = (now.year + 1, 1) if now.month == 12 else (now.year, now.month + 1)
+    return datetime(year, month, 1, tzinfo=timezone.utc).timestamp()
+
+
+def _header_number(headers, name):
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucketRateLimiter:
+    """
+    Token bucket thread-safe con límite por segundo y cuota mensual.
+    'acquire' bloquea hasta que haya token (máximo max_wait segundos).
+    """
+
+    def __init__(self, rate_per_second=DEFAULT_RATE_PER_SECOND, burst=None,
+                 monthly_quota=None, max_wait=DEFAULT_MAX_WAIT):
+        self.configured_rate = float(rate_per_second)
+        self.rate = self.configured_rate
+        self.capacity = float(burst or max(1.0, self.configured_rate))
+        self.tokens = self.capacity
+        self.max_wait = max_wait
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+        # Cuota mensual (del plan o de X-RateLimit-Requests-*); se descuenta desde el
+        # arranque y los headers la corrigen con el valor real
+        self.monthly_quota = monthly_quota
+        self.monthly_remaining = monthly_quota
+        self.quota_resets_at = None  # time.time() en que se renueva la cuota
+
+        # Métricas
+        self.requests_made = 0
+        self.queued = 0
+        self.total_wait_seconds = 0.0
+        self.throttled = 0
+
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def _quota_available(self):
+        """
+        Con la cuota agotada, la renueva si ya pasó su reset (X-RateLimit-Requests-Reset
+        o, sin ese header, el inicio del mes siguiente). Se llama con el lock tomado.
+        """
+        if self.monthly_remaining is None or self.monthly_remaining > 0:
+            return True
+        now = time.time()
+        if self.quota_resets_at is None:
+            self.quota_resets_at = _next_month_start(now)
+        if now < self.quota_resets_at:
+            return False
+        # Sin cuota configurada el restante vuelve a ser desconocido hasta la siguiente respuesta
+        self.monthly_remaining = self.monthly_quota
+        self.quota_resets_at = None
+        logger.info(f"🔄 Cuota mensual de RapidAPI renovada: {self.monthly_remaining}")
+        return True
+
+    def acquire(self):
+        """Espera un token. Regresa los segundos esperados."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                if not self._quota_available():
+                    raise RateLimitExceeded("Cuota mensual de RapidAPI agotada")
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    self.requests_made += 1
+                    if self.monthly_remaining is not None:
+                        self.monthly_remaining -= 1
+                    if waited:
+                        self.queued += 1
+                        self.total_wait_seconds += waited
+                    return waited
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            if waited + wait > self.max_wait:
+                raise RateLimitExceeded(
+                    f"Rate limit de RapidAPI: se requieren {waited + wait:.1f}s de espera (máx {self.max_wait}s)"
+                )
+            time.sleep(wait)
+            waited += wait
+
+    def is_congested(self):
+        """True si un acquire ahora tendría que esperar (bucket vacío, pausa o ritmo reducido por 429)."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return now < self.blocked_until or self.tokens < 1 or self.rate < self.configured_rate
+
+    def update_from_headers(self, headers):
+        """Ajusta cuota y ritmo con los headers X-RateLimit-* de la respuesta."""
+        limit = _header_number(headers, 'X-RateLimit-Requests-Limit')
+        remaining = _header_number(headers, 'X-RateLimit-Requests-Remaining')
+        reset = _header_number(headers, 'X-RateLimit-Requests-Reset')
+        rate_remaining = _header_number(headers, 'X-RateLimit-Remaining')
+        rate_reset = _header_number(headers, 'X-RateLimit-Reset')
+
+        with self._lock:
+            if limit is not None:
+                self.monthly_quota = int(limit)
+            if remaining is not None:
+                self.monthly_remaining = int(remaining)
+            if reset is not None:
+                self.quota_resets_at = time.time() + reset
+            # Ventana corta agotada: pausar hasta su reset
+            if rate_remaining is not None and rate_remaining <= 0 and rate_reset:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + rate_reset)
+            # Recuperar el ritmo gradualmente después de un 429
+            if self.rate < self.configured_rate:
+                self.rate = min(self.configured_rate, self.rate * 1.1)
+
+    def on_throttled(self, retry_after=None):
+        """Registra un 429: pausa el bucket y reduce el ritmo a la mitad."""
+        with self._lock:
+            self.throttled += 1
+            pause = retry_after if retry_after else 1.0 / self.rate
+            self.blocked_until = max(self.blocked_until, time.monotonic() + pause)
+            self.rate = max(MIN_RATE_PER_SECOND, self.rate / 2)
+            self.tokens = 0.0
+        logger.warning(f"⚠️ RapidAPI 429: pausando {pause:.1f}s, ritmo ahora {self.rate:.2f} req/s")
+        return pause
+
+    def status(self):
+        with self._lock:
+            resets_in = round(max(0.0, self.quota_resets_at - time.time())) if self.quota_resets_at else None
+            return {
+                "rate_per_second": round(self.rate, 2),
+                "configured_rate_per_second": self.configured_rate,
+                "burst": self.capacity,
+                "monthly_quota": self.monthly_quota,
+                "monthly_remaining": self.monthly_remaining,
+                "quota_reset_seconds": resets_in,
+                "requests_made": self.requests_made,
+                "queued": self.queued,
+                "total_wait_seconds": round(self.total_wait_seconds, 2),
+                "throttled_429": self.throttled,
+                "blocked_for_seconds": round(max(0.0, self.blocked_until - time.monotonic()), 2)
+            }
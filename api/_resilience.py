@@ -0,0 +1,119 @@
+"""
+Piezas de resiliencia para el cliente de RapidAPI: medición de latencia por
+endpoint (para calcular el retraso de los hedged requests) y circuit breaker
+para dejar de esperar timeouts de 20-30s cuando el upstream no responde.
+"""
+import threading
+import time
+from collections import deque
+
+# Circuit breaker
+DEFAULT_FAILURE_THRESHOLD = 5  # fallos consecutivos para abrir el circuito
+DEFAULT_COOLDOWN_SECONDS = 30.0  # tiempo abierto antes de dejar pasar un request de prueba
+
+# Hedged requests
+DEFAULT_HEDGE_DELAY = 2.0  # retraso cuando aún no hay suficientes muestras de latencia
+MIN_HEDGE_DELAY = 0.25
+MIN_LATENCY_SAMPLES = 20
+
+
+class CircuitOpenError(Exception):
+    """El circuito del endpoint está abierto: no se intenta el request."""
+
+
+class LatencyTracker:
+    """Ventana de las últimas latencias (en segundos) de un endpoint."""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct):
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def hedge_delay(self):
+        """Retraso antes de lanzar el segundo intento: p95 observado (o un default sin muestras)."""
+        with self._lock:
+            enough = len(self._samples) >= MIN_LATENCY_SAMPLES
+        if not enough:
+            return DEFAULT_HEDGE_DELAY
+        return max(MIN_HEDGE_DELAY, self.percentile(95))
+
+    def stats(self):
+        with self._lock:
+            count = len(self._samples)
+        p50, p95, p99 = self.percentile(50), self.percentile(95), self.percentile(99)
+        return {
+            "samples": count,
+            "p50_ms": round(p50 * 1000) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000) if p95 is not None else None,
+            "p99_ms": round(p99 * 1000) if p99 is not None else None
+        }
+
+
+class CircuitBreaker:
+    """
+    closed -> open después de failure_threshold fallos consecutivos.
+    open -> half_open cuando pasa el cooldown; un solo request de prueba
+    decide si vuelve a closed (éxito) u open (fallo).
+    """
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, cooldown_seconds=DEFAULT_COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown_seconds:
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def is_open(self):
+        with self._lock:
+            return self.state != "closed"
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "rejected": self.rejected,
+                "open_for_seconds": round(max(0.0, self.cooldown_seconds - (time.monotonic() - self.opened_at)), 1)
+                if self.state == "open" else 0.0
+            }
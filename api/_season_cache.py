@@ -0,0 +1,49 @@
+"""
+Cache en proceso de la temporada activa (fila de 'seasons' con is_active = true).
+
+Casi todos los endpoints empiezan leyendo la temporada activa; con este cache la
+fila se consulta a lo más una vez cada ttl_seconds por instancia. set_current_week
+lo invalida al escribir current_week. Otras instancias (Vercel) pueden ver el valor
+anterior hasta que venza su TTL, por eso el TTL es corto.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEASON_TTL = 60  # segundos
+
+
+class ActiveSeasonProvider:
+    """
+    fetch() debe regresar la fila de la temporada activa (dict) o None.
+    get() regresa una copia para que los endpoints no modifiquen el cache.
+    """
+
+    def __init__(self, fetch, ttl_seconds=DEFAULT_SEASON_TTL):
+        self._fetch = fetch
+        self.ttl_seconds = ttl_seconds
+        self._season = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    def _is_fresh(self):
+        return self._season is not None and time.monotonic() - self._fetched_at < self.ttl_seconds
+
+    def get(self, refresh=False):
+        with self._lock:
+            if not refresh and self._is_fresh():
+                return dict(self._season)
+            season = self._fetch()
+            # No se cachea "sin temporada activa" para no ocultar una temporada recién activada
+            self._season = dict(season) if season else None
+            self._fetched_at = time.monotonic()
+            return dict(season) if season else None
+
+    def invalidate(self):
+        with self._lock:
+            self._season = None
+            self._fetched_at = 0.0
+        logger.info("🗑️ Cache de temporada activa invalidado")
+
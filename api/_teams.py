@@ -0,0 +1,147 @@
+"""
+Directorio inmutable de equipos para resolver nombres de la API externa a
+equipos locales sin consultar Supabase.
+
+Los índices (en minúsculas) se calculan una sola vez: abreviación, nombre
+('Cowboys', que también es el shortName de RapidAPI), nombre completo
+('Dallas Cowboys', displayName de /nfl-events), ciudad (solo ciudades con un
+único equipo) y una tabla de alias para abreviaciones y nombres alternos.
+"""
+from types import MappingProxyType
+
+# Alias -> nombre del equipo (se resuelve contra el índice de nombres)
+TEAM_ALIASES = {
+    # Abreviaciones que cambian entre proveedores
+    'wsh': 'commanders',
+    'was': 'commanders',
+    'jac': 'jaguars',
+    'jax': 'jaguars',
+    'la': 'rams',
+    'lar': 'rams',
+    'lv': 'raiders',
+    'lvr': 'raiders',
+    'lac': 'chargers',
+    'nyg': 'giants',
+    'nyj': 'jets',
+    'gb': 'packers',
+    'gnb': 'packers',
+    'kc': 'chiefs',
+    'kan': 'chiefs',
+    'ne': 'patriots',
+    'nwe': 'patriots',
+    'no': 'saints',
+    'nor': 'saints',
+    'sf': '49ers',
+    'sfo': '49ers',
+    'tb': 'buccaneers',
+    'tam': 'buccaneers',
+    # Nombres y sedes anteriores
+    'washington': 'commanders',
+    'washington football team': 'commanders',
+    'football team': 'commanders',
+    'redskins': 'commanders',
+    'oakland raiders': 'raiders',
+    'oak': 'raiders',
+    'san diego chargers': 'chargers',
+    'sd': 'chargers',
+    'st. louis rams': 'rams',
+    'stl': 'rams',
+    # Apodos comunes
+    'niners': '49ers',
+    'bucs': 'buccaneers',
+    'ny giants': 'giants',
+    'ny jets': 'jets',
+}
+
+
+def _key(value):
+    return (value or '').strip().lower()
+
+
+class TeamDirectory:
+    """
+    Índices de solo lectura sobre las filas de 'teams' (id, name, city, abbreviation).
+    Cada equipo se expone como un mapping de solo lectura.
+    """
+
+    def __init__(self, teams, aliases=TEAM_ALIASES):
+        frozen = tuple(MappingProxyType(dict(team)) for team in teams)
+        self.teams = frozen
+        self._by_id = MappingProxyType({team['id']: team for team in frozen})
+
+        by_abbr = {}
+        by_name = {}
+        by_full = {}
+        city_teams = {}
+        for team in frozen:
+            abbr, name, city = _key(team.get('abbreviation')), _key(team.get('name')), _key(team.get('city'))
+            if abbr:
+                by_abbr.setdefault(abbr, team)
+            if name:
+                by_name.setdefault(name, team)
+            if city and name:
+                by_full.setdefault(f"{city} {name}", team)
+            if city:
+                city_teams.setdefault(city, []).append(team)
+
+        self._by_abbr = MappingProxyType(by_abbr)
+        self._by_name = MappingProxyType(by_name)
+        self._by_full = MappingProxyType(by_full)
+        # Una ciudad con varios equipos (Los Angeles, New York) no identifica al equipo
+        self._by_city = MappingProxyType({city: ts[0] for city, ts in city_teams.items() if len(ts) == 1})
+        self._aliases = MappingProxyType({_key(alias): _key(target) for alias, target in aliases.items()})
+
+    def __len__(self):
+        return len(self.teams)
+
+    def get(self, team_id):
+        """Equipo por id local, o None."""
+        return self._by_id.get(team_id)
+
+    def resolve(self, value):
+        """
+        Resuelve un texto de la API (abreviación, nombre, nombre completo, ciudad
+        o alias) al equipo local, o None.
+        """
+        key = _key(value)
+        if not key:
+            return None
+        team = (self._by_abbr.get(key) or self._by_full.get(key) or self._by_name.get(key)
+                or self._by_city.get(key))
+        if team:
+            return team
+        alias = self._aliases.get(key)
+        if alias:
+            return self._by_name.get(alias)
+        # "Ciudad Nombre" con una ciudad distinta a la de la base: probar la(s) última(s) palabra(s)
+        words = key.split()
+        for size in (2, 1):
+            if len(words) > size:
+                tail = ' '.join(words[-size:])
+                team = self._by_name.get(tail) or self._by_name.get(self._aliases.get(tail, ''))
+                if team:
+                    return team
+        return None
+
+    def resolve_api_team(self, api_team):
+        """
+        Resuelve el objeto 'team' de la API (abbreviation, displayName, location,
+        name, shortDisplayName/shortName). La abreviación tiene prioridad porque
+        distingue equipos de la misma ciudad (LAR vs LAC).
+        """
+        api_team = api_team or {}
+        location, name = _key(api_team.get('location')), _key(api_team.get('name'))
+        candidates = (
+            api_team.get('abbreviation'),
+            api_team.get('displayName'),
+            f"{location} {name}" if location and name else None,
+            api_team.get('name'),
+            api_team.get('shortDisplayName'),
+            api_team.get('shortName'),
+            api_team.get('location'),
+        )
+        for candidate in candidates:
+            team = self.resolve(candidate)
+            if team:
+                return team
+        return None
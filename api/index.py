@@ -4,13 +4,24 @@ from supabase import create_client, Client
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import os
+import sys
 import pytz
 import logging
 import requests
-import asyncio
-from pydantic import BaseModel
+import time
+from pydantic import BaseModel, Field
 from math import floor
 
+# Módulos auxiliares junto a index.py (prefijo _ para que Vercel no los exponga como funciones)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from _nfl_client import NFLClient, fan_out, DEFAULT_MAX_CONCURRENCY, DEFAULT_MAX_STALE_SECONDS
+from _nfl_cache import SeasonEventsCache, DEFAULT_EVENTS_TTL, DEFAULT_EVENTS_MAX_STALE
+from _rate_limit import TokenBucketRateLimiter, RateLimitExceeded, DEFAULT_RATE_PER_SECOND
+from _resilience import CircuitOpenError
+from _season_cache import ActiveSeasonProvider, DEFAULT_SEASON_TTL
+from _teams import TeamDirectory
+from _entry_rollup import ENTRY_STAT_FIELDS, ENTRY_ROLLUP_FIELDS, compute_entry_stats, pick_order, rollup_entries
+
 # Load environment variables from .env.local
 load_dotenv('.env.local')
 # Also try loading from .env as fallback
@@ -41,12 +52,73 @@ if SUPABASE_URL and SUPABASE_KEY:
 else:
     logger.warning("⚠️ Supabase vars missing")
 
+# Cliente con service_role solo para las funciones RPC restringidas (score_season_picks)
+SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+supabase_admin: Client = None
+if SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY:
+    try:
+        supabase_admin = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+    except Exception as e:
+        logger.error(f"❌ Supabase service role error: {e}")
+
 # Configuración de NFL API Data
 RAPIDAPI_KEY = os.getenv("RAPIDAPI_KEY", "115f54c5d8msh65bec7d1186e70fp12be67jsn8fc1b8736a43")
-BASE_URL = "https://nfl-api-data.p.rapidapi.com"
+# BASE_URL se puede apuntar a scripts/rapidapi_standin.py para pruebas offline
+BASE_URL = os.getenv("BASE_URL", "https://nfl-api-data.p.rapidapi.com")
 RAPIDAPI_HOST = "nfl-api-data.p.rapidapi.com"
 CDMX_TZ = pytz.timezone('America/Mexico_City')
 
+def utc_timestamp():
+    """
+    Valor para matches.updated_at: UTC con zona y el mismo formato en todos los
+    endpoints, para que la marca de /auto-update-picks lo compare sin ambigüedad.
+    """
+    return datetime.now(pytz.utc).isoformat()
+
+# Límites del plan de RapidAPI (por segundo y mensual)
+rapidapi_limiter = TokenBucketRateLimiter(
+    rate_per_second=float(os.getenv("RAPIDAPI_RATE_PER_SECOND", DEFAULT_RATE_PER_SECOND)),
+    monthly_quota=int(os.getenv("RAPIDAPI_MONTHLY_QUOTA")) if os.getenv("RAPIDAPI_MONTHLY_QUOTA") else None
+)
+
+# Cliente compartido (sesión con keep-alive) para todas las llamadas a RapidAPI
+nfl_client = NFLClient(
+    RAPIDAPI_KEY, base_url=BASE_URL, host=RAPIDAPI_HOST, rate_limiter=rapidapi_limiter,
+    max_stale_seconds=int(os.getenv("NFL_MAX_STALE_SECONDS", DEFAULT_MAX_STALE_SECONDS))
+)
+
+# Cache compartido del payload de /nfl-events por año (TTL en segundos, disco opcional)
+season_events_cache = SeasonEventsCache(
+    nfl_client,
+    ttl_seconds=int(os.getenv("NFL_EVENTS_CACHE_TTL", DEFAULT_EVENTS_TTL)),
+    disk_dir=os.getenv("NFL_EVENTS_CACHE_DIR") or None,
+    streaming=os.getenv("NFL_EVENTS_STREAMING", "true").lower() in ("1", "true", "yes"),
+    max_stale_seconds=int(os.getenv("NFL_MAX_STALE_SECONDS", DEFAULT_EVENTS_MAX_STALE))
+)
+
+def fetch_active_season():
+    season_query = supabase.table("seasons").select("*").eq("is_active", True).execute()
+    return season_query.data[0] if season_query.data else None
+
+# Temporada activa cacheada por instancia; set_current_week la invalida al escribir
+active_season = ActiveSeasonProvider(
+    fetch_active_season,
+    ttl_seconds=int(os.getenv("ACTIVE_SEASON_CACHE_TTL", DEFAULT_SEASON_TTL))
+)
+
+# Directorio de equipos: se carga una vez por proceso (los equipos no cambian)
+_team_directory = None
+
+def get_team_directory():
+    global _team_directory
+    if _team_directory is None:
+        teams_query = supabase.table("teams").select("id, name, city, abbreviation").execute()
+        if not teams_query.data:
+            return TeamDirectory([])  # No se cachea vacío
+        _team_directory = TeamDirectory(teams_query.data)
+        logger.info(f"📇 Directorio de equipos cargado: {len(_team_directory)} equipos")
+    return _team_directory
+
 # Crear app FastAPI con root_path para que funcione detrás del proxy /api
 app = FastAPI(root_path="/api")
 
@@ -70,33 +142,33 @@ class TeamRecordCreate(BaseModel):
 
 # ENDPOINT: Guardar récord de todos los equipos (actualiza el récord más reciente)
 @app.post("/save-weekly-team-records")
-async def save_weekly_team_records(year: int = Query(...)):
+async def save_weekly_team_records(
+    year: int = Query(...),
+    max_concurrency: int = Query(DEFAULT_MAX_CONCURRENCY, ge=1, le=32, description="Requests simultáneos a la API externa")
+):
     """
     Consulta el récord de cada equipo en la API externa y lo guarda/actualiza en la tabla team_records.
     Ahora la tabla NO tiene campo 'week', solo mantiene el récord más reciente por equipo y año.
     Esto significa que cada vez que se ejecuta, actualiza el récord del equipo para ese año.
+    Los récords se consultan en paralelo (máximo max_concurrency a la vez) y los
+    fallos de cada equipo se reportan por separado en 'failed'. Todos los récords
+    se escriben con un solo upsert sobre (team_id, year).
     """
     try:
         logger.info(f"🔄 INICIANDO: Actualización de records de equipos - Año {year}")
         
-        # Obtener todos los equipos locales con info relevante
-        teams_query = supabase.table("teams").select("id, name, city, abbreviation").execute()
-        if not teams_query.data:
+        # Directorio de equipos locales (en memoria)
+        teams = get_team_directory()
+        if not teams:
             raise HTTPException(status_code=404, detail="No hay equipos en la base de datos")
-        teams = teams_query.data
 
         # Obtener lista de equipos de la API externa
-        api_url = f"{BASE_URL}/nfl-team-listing/v1/data"
-        headers = {
-            'X-RapidAPI-Key': RAPIDAPI_KEY,
-            'X-RapidAPI-Host': RAPIDAPI_HOST
-        }
-        
         logger.info(f"📡 Obteniendo lista de equipos desde API externa")
-        api_resp = requests.get(api_url, headers=headers, timeout=20)
-        if api_resp.status_code != 200:
+        try:
+            api_teams_data = nfl_client.team_listing()
+        except requests.exceptions.HTTPError:
             raise HTTPException(status_code=500, detail="No se pudo obtener lista de equipos de la API externa")
-        api_teams = [t['team'] for t in api_resp.json() if 'team' in t]
+        api_teams = [t['team'] for t in api_teams_data if 'team' in t]
         logger.info(f"✅ {len(api_teams)} equipos obtenidos de la API")
         
         # Log: mostrar todos los equipos únicos de la API
@@ -108,45 +180,16 @@ async def save_weekly_team_records(year: int = Query(...)):
         for team_name, abbr in sorted(unique_teams.items()):
             logger.info(f"   • {team_name} ({abbr})")
 
-        # Mapeo: para cada equipo de la API, buscar el id local usando abbreviation, name o location
-        # IMPORTANTE: Priorizar abbreviation porque es único (ej: LAR vs LAC en Los Angeles)
-        def find_local_team(api_team):
-            api_name = api_team.get('name', '').lower()
-            api_city = api_team.get('location', '').lower()
-            api_abbr = api_team.get('abbreviation', '').lower()
-            
-            # 1. Primero buscar por abreviación (es única y más confiable)
-            if api_abbr:
-                for t in teams:
-                    if t['abbreviation'].lower() == api_abbr:
-                        return t['id']
-            
-            # 2. Luego por nombre exacto
-            if api_name:
-                for t in teams:
-                    if t['name'].lower() == api_name:
-                        return t['id']
-            
-            # 3. Fallback: buscar por ciudad (puede tener múltiples equipos)
-            if api_city:
-                for t in teams:
-                    if t['city'].lower() == api_city:
-                        return t['id']
-            
-            # 4. Último intento: inclusión de nombre
-            if api_name:
-                for t in teams:
-                    if t['name'].lower() in api_name or api_name in t['name'].lower():
-                        return t['id']
-            
-            return None
-
-        inserted = 0
-        updated = 0
         not_mapped = []  # Equipos de la API que no mapearon
+        failed = []  # Equipos cuyo récord no se pudo obtener
+        stale = []  # Equipos con el último récord bueno (RapidAPI falló)
+        mapped_teams = []  # (nfl_id, local_team_id)
         
+        # Mapeo: para cada equipo de la API, buscar el equipo local por abbreviation, nombre o ciudad
+        # IMPORTANTE: la abreviación tiene prioridad porque es única (ej: LAR vs LAC en Los Angeles)
         for api_team in api_teams:
-            local_team_id = find_local_team(api_team)
+            local_team = teams.resolve_api_team(api_team)
+            local_team_id = local_team['id'] if local_team else None
             if not local_team_id:
                 api_team_info = {
                     "name": api_team.get('name'),
@@ -157,24 +200,32 @@ async def save_weekly_team_records(year: int = Query(...)):
                 not_mapped.append(api_team_info)
                 logger.warning(f"⚠️ No se encontró equipo local para {api_team}")
                 continue
-                
-            nfl_id = api_team.get('id')
-            
-            # Obtener récord del equipo desde la API
-            url = f"{BASE_URL}/nfl-team-record?id={nfl_id}&year={year}"
-            response = requests.get(url, headers=headers, timeout=20)
-            
-            if response.status_code != 200:
-                logger.warning(f"⚠️ No se pudo obtener récord para equipo NFL ID {nfl_id}")
+            mapped_teams.append((api_team.get('id'), local_team_id))
+        
+        # Obtener récords de todos los equipos desde la API en paralelo
+        def fetch_team_record(team):
+            nfl_id, _ = team
+            return nfl_client.team_record(nfl_id, year)
+        
+        logger.info(f"📡 Consultando {len(mapped_teams)} récords (concurrencia máx: {max_concurrency})")
+        fetch_results = fan_out(fetch_team_record, mapped_teams, max_concurrency=max_concurrency)
+        
+        records_by_team = {}  # local_team_id -> récord (un equipo mapeado dos veces se escribe una vez)
+        for (nfl_id, local_team_id), data, error in fetch_results:
+            if error is not None:
+                logger.warning(f"⚠️ No se pudo obtener récord para equipo NFL ID {nfl_id}: {error}")
+                failed.append({"nfl_id": nfl_id, "team_id": local_team_id, "error": str(error)})
                 continue
+            if data.get('stale'):
+                stale.append({"nfl_id": nfl_id, "team_id": local_team_id, "age_seconds": data.get('age_seconds')})
                 
-            data = response.json()
             items = data.get('items', [])
             
             # Buscar el récord 'overall' (general)
             overall = next((item for item in items if item.get('id') == '0' or item.get('name') == 'overall'), None)
             if not overall:
                 logger.warning(f"⚠️ No se encontró récord global para equipo NFL ID {nfl_id}")
+                failed.append({"nfl_id": nfl_id, "team_id": local_team_id, "error": "Sin récord 'overall'"})
                 continue
                 
             # Extraer wins, losses, ties
@@ -183,27 +234,28 @@ async def save_weekly_team_records(year: int = Query(...)):
             ties = next((s['value'] for s in overall.get('stats', []) if s['name'] == 'ties'), 0)
             
             # Datos del récord (SIN campo week)
-            record_data = {
+            records_by_team[local_team_id] = {
                 "team_id": local_team_id,
                 "year": year,
                 "wins": wins,
                 "losses": losses,
                 "ties": ties
             }
-            
-            # Verificar si ya existe un récord para este equipo y año
-            existing = supabase.table("team_records").select("id").eq("team_id", local_team_id).eq("year", year).execute()
-            
-            if existing.data:
-                # ACTUALIZAR récord existente
-                supabase.table("team_records").update(record_data).eq("id", existing.data[0]['id']).execute()
-                updated += 1
-                logger.info(f"✏️ Actualizado: Team {local_team_id} - {wins}-{losses}-{ties}")
-            else:
-                # INSERTAR nuevo récord
-                supabase.table("team_records").insert(record_data).execute()
-                inserted += 1
-                logger.info(f"➕ Insertado: Team {local_team_id} - {wins}-{losses}-{ties}")
+            logger.info(f"📋 Team {local_team_id} - {wins}-{losses}-{ties}")
+        
+        inserted = 0
+        updated = 0
+        if records_by_team:
+            # Equipos que ya tienen récord este año (solo para reportar insertados vs actualizados)
+            existing = supabase.table("team_records").select("team_id").eq("year", year).execute()
+            existing_team_ids = {r['team_id'] for r in existing.data or []}
+            
+            # Una sola escritura: insert o update según el unique (team_id, year)
+            supabase.table("team_records").upsert(
+                list(records_by_team.values()), on_conflict="team_id,year"
+            ).execute()
+            updated = len(existing_team_ids & records_by_team.keys())
+            inserted = len(records_by_team) - updated
         
         logger.info(f"✅ COMPLETADO - Insertados: {inserted}, Actualizados: {updated}")
         return {
@@ -211,6 +263,9 @@ async def save_weekly_team_records(year: int = Query(...)):
             "updated": updated,
             "not_mapped_count": len(not_mapped),
             "not_mapped": not_mapped,
+            "failed_count": len(failed),
+            "failed": failed,
+            "stale": stale,
             "status": "ok",
             "message": f"Records actualizados para el año {year}"
         }
@@ -227,8 +282,63 @@ def validate_score(score):
     except (ValueError, TypeError):
         return None
 
+def bulk_upsert(table, rows, on_conflict, key_fields, chunk_size=500):
+    """
+    Upsert en bloque sobre 'on_conflict' (un request por cada chunk_size filas).
+    Regresa (filas_escritas, fallidas); cada fallida trae sus llaves y el error.
+    Si un bloque falla completo se reintenta fila por fila para aislar las filas
+    con problema en lugar de perder todo el bloque.
+    """
+    written = []
+    failed = []
+
+    def row_key(row):
+        return tuple(row.get(field) for field in key_fields)
+
+    def failure(row, error):
+        return {**{field: row.get(field) for field in key_fields}, "error": error}
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        try:
+            result = supabase.table(table).upsert(chunk, on_conflict=on_conflict).execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Upsert en bloque a {table} falló ({e}); reintentando fila por fila")
+            for row in chunk:
+                try:
+                    supabase.table(table).upsert(row, on_conflict=on_conflict).execute()
+                    written.append(row)
+                except Exception as row_error:
+                    failed.append(failure(row, str(row_error)))
+            continue
+
+        returned_keys = {row_key(r) for r in result.data or []}  # type: ignore
+        for row in chunk:
+            if row_key(row) in returned_keys:
+                written.append(row)
+            else:
+                failed.append(failure(row, "La fila no fue devuelta por el upsert"))
+
+    return written, failed
+
+def fetch_all_rows(build_query, page_size=1000):
+    """
+    Lee todas las filas de una consulta paginando con range() (PostgREST corta en
+    max_rows). build_query debe regresar una consulta nueva en cada llamada.
+    """
+    rows = []
+    start = 0
+    while True:
+        page = build_query().order("id").range(start, start + page_size - 1).execute()
+        data = page.data or []  # type: ignore
+        rows.extend(data)
+        if len(data) < page_size:
+            return rows
+        start += page_size
+
 class UpdateOddsRequest(BaseModel):
     week: int = None
+    max_concurrency: int = Field(DEFAULT_MAX_CONCURRENCY, ge=1, le=32, description="Requests simultáneos a la API externa")
 
 @app.get("/")
 async def root():
@@ -254,7 +364,11 @@ async def root():
             "GET /schedule-weekly-auto-assign",
             "GET /test-env",
             "GET /list-teams",
-            "GET /test-api"
+            "GET /test-api",
+            "GET /events-cache-stats",
+            "POST /invalidate-events-cache",
+            "GET /rapidapi-quota",
+            "GET /nfl-client-stats"
         ],
         "cron_jobs": {
             "set-current-week": "Martes y Jueves a las 5:00 AM (0 11 * * 2,4)",
@@ -275,12 +389,12 @@ async def get_weekly_odds(week: int = Query(..., description="Número de semana"
     try:
         logger.info(f"Consultando odds para la semana {week}")
         
-        # Obtener season_id actual
-        season_query = supabase.table("seasons").select("id").eq("year", 2025).execute()
-        if not season_query.data:  # type: ignore
-            raise HTTPException(status_code=404, detail="No se encontró la temporada 2025")
+        # Obtener season_id actual (temporada activa en cache)
+        current_season = active_season.get()
+        if not current_season:
+            raise HTTPException(status_code=404, detail="No se encontró temporada activa")
         
-        season_id = season_query.data[0]['id']  # type: ignore
+        season_id = current_season['id']
         
         # Consultar weekly_odds con información de equipos
         odds_query = supabase.table("weekly_odds").select("""
@@ -293,7 +407,7 @@ async def get_weekly_odds(week: int = Query(..., description="Número de semana"
                 home_teams:home_team_id(name, abbreviation),
                 away_teams:away_team_id(name, abbreviation)
             )
-        """).eq("week_number", week).execute()
+        """).eq("season_id", season_id).eq("week_number", week).execute()
         
         if not odds_query.data:  # type: ignore
             return []
@@ -305,91 +419,32 @@ async def get_weekly_odds(week: int = Query(..., description="Número de semana"
         raise HTTPException(status_code=500, detail=f"Error obteniendo odds: {str(e)}")
 
 
-def find_team_match(api_team_name, db_teams):
-    """
-    Buscar coincidencia entre nombre de API y equipos de base de datos
-    """
-    api_name_lower = (api_team_name or "").lower()
-
-    # Mapeo manual de nombres de API a nombres de DB (nombre en DB)
-    team_mappings = {
-        'detroit lions': 'Lions',
-        'los angeles chargers': 'Chargers',
-        'philadelphia eagles': 'Eagles',
-        'dallas cowboys': 'Cowboys',
-        'kansas city chiefs': 'Chiefs',
-        'atlanta falcons': 'Falcons',
-        'tampa bay buccaneers': 'Buccaneers',
-        'cleveland browns': 'Browns',
-        'cincinnati bengals': 'Bengals',
-        'san francisco 49ers': '49ers',
-        'chicago bears': 'Bears',
-        'buffalo bills': 'Bills',
-        'denver broncos': 'Broncos',
-        'arizona cardinals': 'Cardinals',
-        'new york giants': 'Giants',
-        'washington commanders': 'Commanders',
-        'new york jets': 'Jets',
-        'miami dolphins': 'Dolphins',
-        'new england patriots': 'Patriots',
-        'baltimore ravens': 'Ravens',
-        'pittsburgh steelers': 'Steelers',
-        'houston texans': 'Texans',
-        'indianapolis colts': 'Colts',
-        'jacksonville jaguars': 'Jaguars',
-        'tennessee titans': 'Titans',
-        'green bay packers': 'Packers',
-        'minnesota vikings': 'Vikings',
-        'carolina panthers': 'Panthers',
-        'new orleans saints': 'Saints',
-        'los angeles rams': 'Rams',
-        'seattle seahawks': 'Seahawks',
-        'las vegas raiders': 'Raiders'
-    }
-
-    # 1) Intentar mapeo directo por nombre completo (mapeo manual)
-    if api_name_lower in team_mappings:
-        target_name = team_mappings[api_name_lower].lower()
-        for team in db_teams:
-            tname = (team.get('name') or '').lower()
-            if tname == target_name:
-                return team
-
-    # 2) Intentar buscar por abreviación (ej. NYJ, LAR)
-    for team in db_teams:
-        abbr = (team.get('abbreviation') or '').lower()
-        if abbr and (abbr == api_name_lower or abbr in api_name_lower):
-            return team
-
-    # 3) Buscar por coincidencia parcial en el nombre
-    for team in db_teams:
-        team_name_lower = (team.get('name') or '').lower()
-        if team_name_lower and (team_name_lower in api_name_lower or api_name_lower.endswith(team_name_lower)):
-            return team
-
-    # No se encontró match — registrar para depuración
-    logger.warning(f"find_team_match: no match for API team '{api_team_name}'")
-    return None
-
-
 @app.post("/update-weekly-odds")
 async def update_weekly_odds(body: UpdateOddsRequest = Body(None)):
     """
     Actualiza las odds de la semana actual de NFL.
     Si se especifica 'week', actualiza esa semana específica.
     Si no se especifica, actualiza la semana actual.
+    Las odds de todos los eventos se consultan en paralelo (máximo 'max_concurrency'
+    a la vez); si un evento falla se reporta en 'odds_failed' y el resto continúa.
+    Cada partido se empareja con su evento de la API en O(1) mediante un índice
+    {home_team_id, away_team_id} -> evento construido una vez con el directorio de
+    equipos. Todas las odds de la semana se escriben con un solo upsert sobre
+    (match_id, week_number); las filas que no se escriben también van a 'odds_failed'.
     """
     try:
         week_param = body.week if body else None
+        max_concurrency = body.max_concurrency if body else DEFAULT_MAX_CONCURRENCY
         odds_updated = 0
         odds_inserted = 0
+        odds_failed = []
+        odds_stale = []  # Eventos con el último payload bueno (RapidAPI falló)
         
         # Obtener temporada activa
-        season_query = supabase.table("seasons").select("*").eq("is_active", True).execute()
-        if not season_query.data:  # type: ignore
+        current_season = active_season.get()
+        if not current_season:
             raise HTTPException(status_code=404, detail="No se encontró temporada activa")
         
-        current_season = season_query.data[0]  # type: ignore
         season_id = current_season['id']
         
         # Determinar qué semana procesar
@@ -420,19 +475,9 @@ async def update_weekly_odds(body: UpdateOddsRequest = Body(None)):
         
         # Obtener eventos desde la API NFL por año (2025)
         current_year = 2025  # Temporada NFL 2025-2026
-        url = f"{BASE_URL}/nfl-events"
         
         try:
-            headers_api = {
-                'X-RapidAPI-Key': RAPIDAPI_KEY,
-                'X-RapidAPI-Host': RAPIDAPI_HOST
-            }
-            params_api = {
-                'year': current_year
-            }
-            response = requests.get(url, headers=headers_api, params=params_api, timeout=30)
-            response.raise_for_status()
-            data = response.json()
+            data = season_events_cache.get(current_year)
             
             events = data.get('events', [])
             logger.info(f"TOTAL EVENTS FOUND: {len(events)}")
@@ -451,73 +496,72 @@ async def update_weekly_odds(body: UpdateOddsRequest = Body(None)):
             logger.error(f"Error obteniendo eventos de la API: {e}")
             raise HTTPException(status_code=500, detail=f"Error obteniendo eventos: {str(e)}")
         
-        # Crear un diccionario para mapear equipos de API a database
-        teams_query = supabase.table("teams").select("id, name, city, abbreviation").execute()
-        db_teams = []
-        if teams_query.data:  # type: ignore
-            db_teams = teams_query.data  # type: ignore
+        # Directorio de equipos en memoria para mapear equipos de API a database
+        teams = get_team_directory()
+        
+        # Índice de eventos de la semana: {home_team_id, away_team_id} -> evento (una sola pasada)
+        events_by_pair = {}
+        for event in week_events:
+            competitors = event.get('competitions', [{}])[0].get('competitors', [])
+            event_team_ids = frozenset(
+                team['id'] for team in (teams.resolve_api_team(comp.get('team', {})) for comp in competitors) if team
+            )
+            if len(event_team_ids) == 2:
+                events_by_pair.setdefault(event_team_ids, event)
+            else:
+                logger.warning(f"No se pudieron mapear los equipos del evento {event.get('id')}")
         
+        paired_matches = []  # Partidos de la DB con su evento de la API
         for match in matches:
             match_id = match['id']
-            home_team_id = match['home_team_id']
-            away_team_id = match['away_team_id']
-            
-            # Obtener nombres de equipos de la database
-            home_team_query = supabase.table("teams").select("name").eq("id", home_team_id).execute()
-            away_team_query = supabase.table("teams").select("name").eq("id", away_team_id).execute()
+            home_team = teams.get(match['home_team_id'])
+            away_team = teams.get(match['away_team_id'])
             
-            if not home_team_query.data or not away_team_query.data:  # type: ignore
+            if not home_team or not away_team:
                 logger.warning(f"No se encontraron nombres de equipos para match {match_id}")
                 continue
                 
-            home_team_name = home_team_query.data[0]['name']  # type: ignore
-            away_team_name = away_team_query.data[0]['name']  # type: ignore
-            
-            # Buscar el evento en week_events que coincida con estos equipos
-            matching_event = None
-            for event in week_events:
-                competitors = event.get('competitions', [{}])[0].get('competitors', [])
-                if len(competitors) >= 2:
-                    api_team_names = [comp.get('team', {}).get('displayName', '') for comp in competitors]
-                    
-                    # Buscar coincidencias usando la función de matching
-                    home_match = None
-                    away_match = None
-                    
-                    for api_name in api_team_names:
-                        matched_team = find_team_match(api_name, db_teams)
-                        if matched_team:
-                            if matched_team['name'] == home_team_name:
-                                home_match = api_name
-                            elif matched_team['name'] == away_team_name:
-                                away_match = api_name
-                    
-                    # Si encontramos ambos equipos, es una coincidencia
-                    if home_match and away_match:
-                        matching_event = event
-                        logger.info(f"Match encontrado: {home_team_name} ({home_match}) vs {away_team_name} ({away_match})")
-                        break
+            home_team_name = home_team['name']
+            away_team_name = away_team['name']
             
+            matching_event = events_by_pair.get(frozenset((home_team['id'], away_team['id'])))
             if not matching_event:
                 logger.warning(f"No se encontró evento de API para match {match_id} ({home_team_name} vs {away_team_name})")
                 continue
                 
-            event_api_id = matching_event.get('id')
-            logger.info(f"Procesando odds para match {match_id}: {home_team_name} vs {away_team_name} (API ID: {event_api_id})")
+            paired_matches.append({
+                "match": match,
+                "event_api_id": matching_event.get('id'),
+                "home_team_name": home_team_name,
+                "away_team_name": away_team_name
+            })
+        
+        # Obtener odds de todos los eventos en paralelo
+        def fetch_event_odds(paired):
+            return nfl_client.event_odds(paired['event_api_id'])
+        
+        logger.info(f"📡 Consultando odds de {len(paired_matches)} eventos (concurrencia máx: {max_concurrency})")
+        odds_results = fan_out(fetch_event_odds, paired_matches, max_concurrency=max_concurrency)
+        
+        odds_records = []
+        for paired, odds_data, error in odds_results:
+            match = paired['match']
+            match_id = match['id']
+            home_team_id = match['home_team_id']
+            away_team_id = match['away_team_id']
+            event_api_id = paired['event_api_id']
+            
+            if error is not None:
+                logger.error(f"Error obteniendo odds para evento {event_api_id}: {error}")
+                odds_failed.append({"match_id": match_id, "event_api_id": event_api_id, "error": str(error)})
+                continue
+            
+            if odds_data.get('stale'):
+                odds_stale.append({"match_id": match_id, "event_api_id": event_api_id, "age_seconds": odds_data.get('age_seconds')})
+            
+            logger.info(f"Procesando odds para match {match_id}: {paired['home_team_name']} vs {paired['away_team_name']} (API ID: {event_api_id})")
             
-            # Obtener odds del evento
             try:
-                odds_url = f"{BASE_URL}/nfl-eventodds"
-                odds_params = {
-                    'id': event_api_id
-                }
-                odds_response = requests.get(odds_url, headers={
-                    'X-RapidAPI-Key': RAPIDAPI_KEY,
-                    'X-RapidAPI-Host': RAPIDAPI_HOST
-                }, params=odds_params, timeout=30)
-                odds_response.raise_for_status()
-                odds_data = odds_response.json()
-                
                 # Procesar odds
                 odds_items = odds_data.get('items', [])
                 if not odds_items:
@@ -577,40 +621,40 @@ async def update_weekly_odds(body: UpdateOddsRequest = Body(None)):
                     odds_record['over_odds'] = primary_odds.get('overOdds')
                     odds_record['under_odds'] = primary_odds.get('underOdds')
                 
-                # Verificar si ya existe un registro para este match
-                logger.info(f"Intentando insertar/actualizar odds: {odds_record}")
-                
-                existing_query = supabase.table("weekly_odds").select("id").eq("match_id", match_id).eq("week_number", week_param).execute()
-                
-                if existing_query.data:  # type: ignore
-                    # Actualizar registro existente
-                    logger.info(f"Actualizando registro existente para match {match_id}")
-                    update_result = supabase.table("weekly_odds").update(odds_record).eq("match_id", match_id).eq("week_number", week_param).execute()
-                    if update_result.data:  # type: ignore
-                        odds_updated += 1
-                        logger.info(f"✅ Odds actualizados para match {match_id}, provider {provider_name}")
-                    else:
-                        logger.warning(f"❌ Error actualizando odds para match {match_id}: {update_result}")
-                else:
-                    # Insertar nuevo registro
-                    logger.info(f"Insertando nuevo registro para match {match_id}")
-                    insert_result = supabase.table("weekly_odds").insert(odds_record).execute()
-                    if insert_result.data:  # type: ignore
-                        odds_inserted += 1
-                        logger.info(f"✅ Odds insertados para match {match_id}, provider {provider_name}")
-                    else:
-                        logger.warning(f"❌ Error insertando odds para match {match_id}: {insert_result}")
+                logger.info(f"Odds preparadas para match {match_id}, provider {provider_name}")
+                odds_records.append(odds_record)
             
             except Exception as e:
                 logger.error(f"Error procesando odds para evento {event_api_id}: {e}")
+                odds_failed.append({"match_id": match_id, "event_api_id": event_api_id, "error": str(e)})
                 continue
         
-        logger.info(f"COMPLETADO - Odds actualizadas: {odds_updated}, Odds insertadas: {odds_inserted}")
+        if odds_records:
+            # Partidos que ya tenían odds esta semana (solo para reportar insertados vs actualizados)
+            existing_query = supabase.table("weekly_odds").select("match_id").eq("season_id", season_id).eq("week_number", week_param).execute()
+            existing_match_ids = {r['match_id'] for r in existing_query.data or []}  # type: ignore
+            
+            # Una sola escritura para toda la semana
+            written, write_failed = bulk_upsert(
+                "weekly_odds", odds_records, on_conflict="match_id,week_number", key_fields=("match_id", "week_number")
+            )
+            event_ids = {r['match_id']: r['event_api_id'] for r in odds_records}
+            for failure in write_failed:
+                logger.warning(f"❌ Error guardando odds para match {failure['match_id']}: {failure['error']}")
+                odds_failed.append({"match_id": failure['match_id'], "event_api_id": event_ids.get(failure['match_id']), "error": failure['error']})
+            odds_updated = sum(1 for r in written if r['match_id'] in existing_match_ids)
+            odds_inserted = len(written) - odds_updated
+        
+        logger.info(f"COMPLETADO - Odds actualizadas: {odds_updated}, Odds insertadas: {odds_inserted}, Fallidas: {len(odds_failed)}")
         
         return {
             "odds_updated": odds_updated,
             "odds_inserted": odds_inserted,
+            "odds_failed": odds_failed,
+            "odds_stale": odds_stale,
+            "events_stale": data.get('stale', False),
             "week": week_param,
+            "upstream_degraded": nfl_client.is_degraded("/nfl-eventodds"),
             "status": "completed"
         }
         
@@ -620,6 +664,7 @@ async def update_weekly_odds(body: UpdateOddsRequest = Body(None)):
 
 class UpdateMatchesRequest(BaseModel):
     week: int = None
+    refresh_events: bool = False
 
 @app.post("/update-matches")
 async def update_matches(body: UpdateMatchesRequest = Body(None)):
@@ -631,18 +676,23 @@ async def update_matches(body: UpdateMatchesRequest = Body(None)):
     Ejemplos de uso:
     - POST /update-matches (sin body) -> procesa semana actual hacia adelante
     - POST /update-matches {"week": 1} -> procesa solo semana 1
+    - POST /update-matches {"refresh_events": true} -> ignora el cache de /nfl-events
+    
+    Los equipos y los partidos de la temporada se cargan una sola vez y se comparan
+    en memoria contra los eventos de la API; los partidos nuevos o con cambios se
+    escriben en un solo upsert y la respuesta incluye un resumen por semana.
     """
     try:
         week_param = body.week if body else None
+        refresh_events = body.refresh_events if body else False
         matches_updated = 0
         matches_inserted = 0
 
         # Obtener la temporada activa
-        season_query = supabase.table("seasons").select("*").eq("is_active", True).execute()
-        if not season_query.data:
+        current_season = active_season.get()
+        if not current_season:
             logger.error("No hay temporada activa en la base de datos")
             raise HTTPException(status_code=404, detail="No hay temporada activa")
-        current_season = season_query.data[0]
         season_id = current_season['id']
         nfl_season_year = current_season['year']
 
@@ -673,26 +723,25 @@ async def update_matches(body: UpdateMatchesRequest = Body(None)):
                 date_cursor += timedelta(days=7)
         
         # Obtener eventos desde la API NFL por año (usar año de la temporada)
-        url = f"{BASE_URL}/nfl-events"
+        url = nfl_client.url("/nfl-events")
         
         try:
-            headers = {
-                'X-RapidAPI-Key': RAPIDAPI_KEY,
-                'X-RapidAPI-Host': RAPIDAPI_HOST
-            }
-            params = {
-                'year': nfl_season_year
-            }
-            
-            response = requests.get(url, headers=headers, params=params, timeout=30)
-            
-            if response.status_code == 429:
-                logger.warning(f"RATE LIMIT: Esperando 60 segundos...")
-                await asyncio.sleep(60)
-                raise HTTPException(status_code=429, detail="Rate limit alcanzado")
-            
-            response.raise_for_status()
-            data = response.json()
+            try:
+                # Camino de escritura: nunca con la copia vencida (marcadores y status viejos
+                # pisarían los actuales y moverían updated_at)
+                data = season_events_cache.get(nfl_season_year, refresh=refresh_events, allow_stale=False)
+            except RateLimitExceeded as rle:
+                logger.warning(f"RATE LIMIT: {rle}")
+                raise HTTPException(status_code=429, detail=f"Rate limit alcanzado: {rle}")
+            except (CircuitOpenError, requests.exceptions.Timeout, requests.exceptions.ConnectionError) as ue:
+                logger.warning(f"⚠️ RapidAPI no disponible ({ue}); no se actualizan partidos con eventos vencidos")
+                raise HTTPException(status_code=503, detail=f"RapidAPI no disponible: {ue}")
+            except requests.exceptions.HTTPError as he:
+                # El cliente ya esperó y reintentó los 429; si persiste, fallar sin bloquear
+                if he.response is not None and he.response.status_code == 429:
+                    logger.warning(f"RATE LIMIT: 429 persistente después de reintentos")
+                    raise HTTPException(status_code=429, detail="Rate limit alcanzado")
+                raise
             
             if not data or 'events' not in data or not data['events']:
                 logger.info(f"NO EVENTS: Sin eventos para el año {nfl_season_year}")
@@ -737,10 +786,33 @@ async def update_matches(body: UpdateMatchesRequest = Body(None)):
             else:
                 logger.info(f"PROCESANDO SEMANA ESPECÍFICA {week_param}: No filtrar por fecha, procesando solo eventos de temporada regular")
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"ERROR API: {url} - {e}")
             raise HTTPException(status_code=500, detail=f"Error consultando API NFL: {str(e)}")
 
+        # Equipos del directorio en memoria; partidos de la temporada una sola vez para comparar en memoria
+        teams = get_team_directory()
+
+        existing_query = supabase.table("matches").select("*").eq("season_id", season_id)
+        if week_param is not None:
+            existing_query = existing_query.eq("week", week_param)
+        existing_matches = {
+            (m['week'], m['home_team_id'], m['away_team_id']): m
+            for m in existing_query.execute().data or []
+        }
+        logger.info(f"📊 {len(existing_matches)} partidos cargados de la base de datos")
+
+        rows_by_key = {}  # (week, home_team_id, away_team_id) -> fila a escribir
+        week_summary = {}
+        not_mapped = []
+
+        def summary_for(week):
+            return week_summary.setdefault(week, {"inserted": 0, "updated": 0, "unchanged": 0, "failed": 0})
+
+        now_str = utc_timestamp()
+
         logger.info(f"PROCESSING: {len(events)} eventos NFL")
         for i, event in enumerate(events):
             logger.info(f"EVENT {i+1}/{len(events)}: Processing event ID {event.get('id')}")
@@ -813,46 +885,17 @@ async def update_matches(body: UpdateMatchesRequest = Body(None)):
             # Verificar si el partido está completado
             status = competition.get('status', {}).get('type', {})
             is_completed = status.get('completed', False)
-            # Buscar los equipos por nombre
-            logger.info(f"Buscando equipos: {home_team_name} vs {away_team_name}")
-            
-            # Usar abreviaciones para búsqueda más precisa
-            home_abbr = home_team_data['team']['abbreviation']
-            away_abbr = away_team_data['team']['abbreviation']
-            
-            # Buscar por abreviación primero, luego por nombre
-            home_team_query = supabase.table("teams").select("id, name, abbreviation").eq("abbreviation", home_abbr).execute()
-            if not home_team_query.data:
-                home_team_query = supabase.table("teams").select("id, name, abbreviation").ilike("name", f"%{home_team_data['team']['name']}%").execute()
             
-            away_team_query = supabase.table("teams").select("id, name, abbreviation").eq("abbreviation", away_abbr).execute()
-            if not away_team_query.data:
-                away_team_query = supabase.table("teams").select("id, name, abbreviation").ilike("name", f"%{away_team_data['team']['name']}%").execute()
-            
-            logger.info(f"Resultados búsqueda - Home: {home_team_query.data}, Away: {away_team_query.data}")
-            
-            if not home_team_query.data or not away_team_query.data:
+            # Buscar los equipos en memoria
+            home_team = teams.resolve_api_team(home_team_data['team'])
+            away_team = teams.resolve_api_team(away_team_data['team'])
+            if not home_team or not away_team:
                 logger.warning(f"Equipos no encontrados: {home_team_name} vs {away_team_name}")
+                not_mapped.append({"event_id": event.get('id'), "home": home_team_name, "away": away_team_name})
                 continue
-            home_team_id = home_team_query.data[0]['id']  # type: ignore
-            away_team_id = away_team_query.data[0]['id']  # type: ignore
-            
-            logger.info(f"IDs encontrados - Home: {home_team_id}, Away: {away_team_id}")
-            
-            # Buscar el partido en Supabase
-            logger.info(f"Buscando partido: Season {season_id}, Week {week_num}, Home {home_team_id}, Away {away_team_id}")
-            match_query = supabase.table("matches").select("*").eq(
-                "season_id", season_id
-            ).eq(
-                "week", week_num
-            ).eq(
-                "home_team_id", home_team_id
-            ).eq(
-                "away_team_id", away_team_id
-            ).execute()
-            
-            logger.info(f"Partido encontrado: {len(match_query.data)} resultados")
-            now_str = datetime.now(pytz.utc).strftime("%Y-%m-%d %H:%M:%S")
+            home_team_id = home_team['id']
+            away_team_id = away_team['id']
+            week_num = int(week_num)
             
             # Determinar el estado del partido basado en la información de la API
             # - completed: si is_completed = True
@@ -862,7 +905,7 @@ async def update_matches(body: UpdateMatchesRequest = Body(None)):
                 status_db = "completed"
                 home_score_db = home_score
                 away_score_db = away_score
-            elif home_score > 0 or away_score > 0:
+            elif (home_score or 0) > 0 or (away_score or 0) > 0:
                 # Partido en progreso: tiene scores pero no está completado
                 status_db = "in_progress"
                 home_score_db = home_score
@@ -873,11 +916,9 @@ async def update_matches(body: UpdateMatchesRequest = Body(None)):
                 home_score_db = None
                 away_score_db = None
 
-            # ...actualización de partido...
-            if match_query.data:
-                match = match_query.data[0]
-                logger.info(f"Partido existente - DB: {match.get('home_score')}-{match.get('away_score')}, API: {home_score}-{away_score}, Status DB: {match.get('status')}, Status API: {status_db}")
-                
+            key = (week_num, home_team_id, away_team_id)
+            match = existing_matches.get(key)
+            if match:
                 # Actualizar si cambió el marcador O el estado
                 # Esto permite actualizar partidos "completed" si el marcador final cambió
                 should_update = (
@@ -885,47 +926,56 @@ async def update_matches(body: UpdateMatchesRequest = Body(None)):
                     match.get('away_score') != away_score_db or
                     match.get('status') != status_db
                 )
-                
-                if should_update:
-                    update_data = {
-                        "home_score": home_score_db,
-                        "away_score": away_score_db,
-                        "status": status_db,
-                        "updated_at": now_str
-                    }
-                    if game_datetime:
-                        update_data["game_date"] = game_datetime
-                    logger.info(f"Actualizando partido ID {match['id']} con datos: {update_data}")
-                    result = supabase.table("matches").update(update_data).eq("id", match['id']).execute()
-                    logger.info(f"Resultado actualización: {result}")
-                    matches_updated += 1
-                    logger.info(f"Actualizado: {home_team_name} {home_score_db} - {away_score_db} {away_team_name} (Semana {week_num}) - Estado: {status_db}")
-                else:
-                    logger.info(f"No necesita actualización: {home_team_name} vs {away_team_name} (marcadores y estado iguales)")
+                if not should_update:
+                    # Solo cuentan como sin cambios los partidos que pasaron por esta comparación
+                    summary_for(week_num)["unchanged"] += 1
+                    continue
+                logger.info(f"Cambio: {home_team_name} {home_score_db} - {away_score_db} {away_team_name} (Semana {week_num}) - Estado: {match.get('status')} -> {status_db}")
+
+            # Todas las filas llevan las mismas columnas para que el upsert en bloque
+            # no sobrescriba game_type/created_at de los partidos existentes
+            rows_by_key[key] = {
+                "season_id": season_id,
+                "week": week_num,
+                "home_team_id": home_team_id,
+                "away_team_id": away_team_id,
+                "game_date": game_datetime,
+                "home_score": home_score_db,
+                "away_score": away_score_db,
+                "status": status_db,
+                "game_type": (match or {}).get('game_type') or "regular",
+                "created_at": (match or {}).get('created_at') or now_str,
+                "updated_at": now_str
+            }
+
+        written = []
+        failed = []
+        if rows_by_key:
+            logger.info(f"💾 Escribiendo {len(rows_by_key)} partidos nuevos o con cambios en un solo upsert")
+            written, failed = bulk_upsert(
+                "matches", list(rows_by_key.values()),
+                on_conflict="season_id,week,home_team_id,away_team_id",
+                key_fields=("week", "home_team_id", "away_team_id")
+            )
+        for row in written:
+            key = (row['week'], row['home_team_id'], row['away_team_id'])
+            if key in existing_matches:
+                summary_for(row['week'])["updated"] += 1
+                matches_updated += 1
             else:
-                # Insertar nuevo partido
-                insert_data = {
-                    "season_id": season_id,
-                    "week": week_num,
-                    "home_team_id": home_team_id,
-                    "away_team_id": away_team_id,
-                    "game_date": game_datetime,
-                    "home_score": home_score_db,
-                    "away_score": away_score_db,
-                    "status": status_db,
-                    "game_type": "regular",
-                    "created_at": now_str,
-                    "updated_at": now_str
-                }
-                logger.info(f"INSERTING: {insert_data}")
-                insert_result = supabase.table("matches").insert(insert_data).execute()
-                logger.info(f"INSERT SUCCESS: {insert_result}")
+                summary_for(row['week'])["inserted"] += 1
                 matches_inserted += 1
-                logger.info(f"INSERTED: {home_team_name} vs {away_team_name} (Semana {week_param})")
-        logger.info(f"COMPLETED - Actualizados: {matches_updated}, Insertados: {matches_inserted}")
+        for failure in failed:
+            logger.warning(f"❌ Error escribiendo partido {failure}")
+            summary_for(failure['week'])["failed"] += 1
+
+        logger.info(f"COMPLETED - Actualizados: {matches_updated}, Insertados: {matches_inserted}, Fallidos: {len(failed)}")
         return {
             "matches_updated": matches_updated,
             "matches_inserted": matches_inserted,
+            "matches_failed": failed,
+            "not_mapped": not_mapped,
+            "weeks": {week: week_summary[week] for week in sorted(week_summary)},
             "status": "completed"
         }
     except HTTPException as he:
@@ -948,11 +998,10 @@ async def set_current_week():
     """
     try:
         # Obtener temporada activa
-        season_query = supabase.table("seasons").select("*").eq("is_active", True).execute()
-        if not season_query.data:
+        current_season = active_season.get(refresh=True)
+        if not current_season:
             raise HTTPException(status_code=404, detail="No hay temporada activa")
         
-        current_season = season_query.data[0]
         season_id = current_season['id']
         now_cdmx = datetime.now(CDMX_TZ)
         
@@ -1047,6 +1096,7 @@ async def set_current_week():
         supabase.table("seasons").update({
             "current_week": calculated_week
         }).eq("id", season_id).execute()
+        active_season.invalidate()
         
         logger.info(f"✅ Semana actual actualizada a: {calculated_week}")
         
@@ -1069,13 +1119,12 @@ async def get_current_week():
     Usa la misma lógica que set_current_week pero en modo solo lectura.
     """
     try:
-        # Simplemente leer el valor de current_week de la temporada activa
-        season_query = supabase.table("seasons").select("*").eq("is_active", True).execute()
-        if not season_query.data:
+        # Siempre desde la BD: otra instancia pudo cambiar current_week dentro del TTL
+        # del cache (la lectura refresca también el cache de esta instancia)
+        current_season = active_season.get(refresh=True)
+        if not current_season:
             raise HTTPException(status_code=404, detail="No hay temporada activa")
         
-        current_season = season_query.data[0]
-        
         return {
             "current_week": current_season['current_week'],
             "season_year": current_season['year'],
@@ -1120,23 +1169,14 @@ async def update_matches_by_year(year: int):
         if year < 2020 or year > 2030:
             raise HTTPException(status_code=400, detail="Año debe estar entre 2020 y 2030")
         
-        url = f"{BASE_URL}/nfl-events"
-        headers = {
-            'X-RapidAPI-Key': RAPIDAPI_KEY,
-            'X-RapidAPI-Host': RAPIDAPI_HOST
-        }
-        params = {
-            'year': year
-        }
-        
-        response = requests.get(url, headers=headers, params=params, timeout=30)
-        response.raise_for_status()
-        data = response.json()
+        data = season_events_cache.get(year)
         
         return {
             "status": "success",
             "year": year,
             "events_found": len(data.get('events', [])),
+            "stale": data.get('stale', False),
+            "age_seconds": data.get('age_seconds'),
             "leagues": data.get('leagues', []),
             "events_sample": data.get('events', [])[:3] if data.get('events') else []
         }
@@ -1145,39 +1185,81 @@ async def update_matches_by_year(year: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/test-api")
-async def test_api():
+async def test_api(refresh: bool = Query(False, description="Consultar la API aunque haya copia vigente en cache")):
+    """
+    Prueba de conectividad con NFL API Data. Si hay una copia vigente del año en
+    cache (y no se pide refresh) se reporta el estado del cache (cached, age_seconds)
+    sin consultar la API; si no, se descarga de verdad y un error se reporta tal cual.
+    """
+    test_year = datetime.now().year
+    url = nfl_client.url("/nfl-events")
     try:
-        # Usar año actual para probar la nueva API
-        test_year = datetime.now().year
-        url = f"{BASE_URL}/nfl-events"
-        headers = {
-            'X-RapidAPI-Key': RAPIDAPI_KEY,
-            'X-RapidAPI-Host': RAPIDAPI_HOST
-        }
-        params = {
-            'year': test_year
-        }
-        logger.info(f"Testing NFL API Data connectivity to: {url}")
-        response = requests.get(url, headers=headers, params=params, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        return {
+        age_seconds = season_events_cache.age(test_year)
+        cached = age_seconds is not None and not refresh
+        if cached:
+            data = season_events_cache.get(test_year)
+        else:
+            logger.info(f"Testing NFL API Data connectivity to: {url}")
+            data = season_events_cache.get(test_year, refresh=True, allow_stale=False)
+            age_seconds = 0
+        result = {
             "status": "success",
             "url": url,
-            "status_code": response.status_code,
+            "cached": cached,
+            "age_seconds": age_seconds,
             "has_events": data.get('events') is not None,
             "events_count": len(data.get('events', [])) if data.get('events') else 0,
             "leagues_count": len(data.get('leagues', [])) if data.get('leagues') else 0,
             "sample_event": data.get('events', [{}])[0] if data.get('events') else {}
         }
+        if not cached:
+            result["status_code"] = 200
+        return result
+    except requests.exceptions.HTTPError as he:
+        status_code = he.response.status_code if he.response is not None else None
+        logger.error(f"NFL API Data test failed: {status_code}")
+        return {
+            "status": "error",
+            "url": url,
+            "cached": False,
+            "status_code": status_code,
+            "error": str(he)
+        }
     except Exception as e:
         logger.error(f"NFL API Data test failed: {e}")
         return {
             "status": "error",
+            "cached": False,
             "error": str(e),
-            "url": f"{BASE_URL}/nfl-events?year={datetime.now().year}"
+            "url": f"{BASE_URL}/nfl-events?year={test_year}"
         }
 
+@app.get("/events-cache-stats")
+async def events_cache_stats():
+    """Estadísticas del cache de /nfl-events (hits, misses, años cacheados)"""
+    return season_events_cache.stats()
+
+@app.post("/invalidate-events-cache")
+async def invalidate_events_cache(year: int = Query(None, description="Año a invalidar (todos si se omite)")):
+    """Invalida el cache de /nfl-events para forzar una nueva descarga"""
+    invalidated = season_events_cache.invalidate(year)
+    logger.info(f"🗑️ Cache de eventos invalidado: {invalidated}")
+    return {
+        "status": "ok",
+        "invalidated_years": invalidated,
+        "stats": season_events_cache.stats()
+    }
+
+@app.get("/rapidapi-quota")
+async def rapidapi_quota():
+    """Estado del rate limiter de RapidAPI: ritmo actual, cuota mensual restante y llamadas en cola"""
+    return rapidapi_limiter.status()
+
+@app.get("/nfl-client-stats")
+async def nfl_client_stats():
+    """Métricas del cliente de RapidAPI: llamadas ejecutadas vs. agrupadas (single-flight) y rate limiter"""
+    return nfl_client.stats()
+
 # --- LÓGICA DE ACTUALIZACIÓN DE PICKS Y ENTRIES ---
 from collections import defaultdict
 
@@ -1242,249 +1324,493 @@ def update_picks_and_entries(supabase, season_id, week_num):
         supabase.table("entries").update(update_data).eq("id", entry_id).execute()
     return True
 
-def update_entry_statistics(supabase, season_id):
+def has_rollup_state(entries):
+    """Las columnas win_run/last_scored_week existen si ya se aplicó la migración."""
+    return bool(entries) and all(field in entries[0] for field in ENTRY_ROLLUP_FIELDS)
+
+def load_entry_picks(supabase, season_id, entry_ids):
+    """Picks de las entradas indicadas agrupados por entrada, en lotes de 200 ids."""
+    picks_by_entry = defaultdict(list)
+    for start in range(0, len(entry_ids), 200):
+        batch = entry_ids[start:start + 200]
+        picks = fetch_all_rows(
+            lambda: supabase.table("picks").select("id, entry_id, week, result").eq("season_id", season_id).in_("entry_id", batch)
+        )
+        for pick in picks:
+            picks_by_entry[pick['entry_id']].append(pick)
+    return picks_by_entry
+
+def write_entry_statistics(changed_entries):
+    """
+    Escribe solo las columnas de estadísticas de las entradas que cambiaron
+    (filas con id y esos campos), agrupadas por valores idénticos: un
+    update(...).in_("id", ids) por grupo, como write_pick_results. Así no se
+    pisan otras columnas de la entrada editadas al mismo tiempo.
+    Regresa (escritas, ids_con_error).
+    """
+    groups = defaultdict(list)
+    for entry in changed_entries:
+        logger.info(f"Entry ID {entry['id']}: W={entry['total_wins']}, L={entry['total_losses']}, "
+                   f"Current Streak={entry['current_streak']}, Longest={entry['longest_streak']}, Status={entry['status']}")
+        stats = tuple(sorted((field, value) for field, value in entry.items() if field != 'id'))
+        groups[stats].append(entry['id'])
+
+    written = 0
+    failed_ids = set()
+    for stats, entry_ids in groups.items():
+        for start in range(0, len(entry_ids), 200):
+            batch = entry_ids[start:start + 200]
+            try:
+                supabase.table("entries").update(dict(stats)).in_("id", batch).execute()
+                written += len(batch)
+            except Exception as e:
+                logger.error(f"❌ Error actualizando entradas {batch}: {e}")
+                failed_ids.update(batch)
+    return written, failed_ids
+
+def update_entry_statistics(supabase, season_id, dry_run=False):
     """
     Actualiza todas las estadísticas de las entradas basándose en los picks.
-    Calcula: total_wins, total_losses, longest_streak, current_streak, status, eliminated_week
+    Carga los picks de la temporada en una sola consulta paginada, los agrupa por
+    entrada en memoria y escribe solo las columnas de estadísticas de las entradas
+    que cambiaron. Con dry_run solo regresa cuántas cambiarían.
     """
-    entries_updated = 0
-    
     # Obtener todas las entradas de la temporada
-    entries_query = supabase.table("entries").select("*").eq("season_id", season_id).execute()
-    if not entries_query.data:
+    entries = fetch_all_rows(lambda: supabase.table("entries").select("*").eq("season_id", season_id))
+    if not entries:
         return 0
+    track_state = has_rollup_state(entries)
+    fields = ENTRY_STAT_FIELDS + ENTRY_ROLLUP_FIELDS if track_state else ENTRY_STAT_FIELDS
     
-    for entry in entries_query.data:
-        entry_id = entry['id']
-        
-        # Obtener todos los picks de esta entrada ordenados por semana
-        picks_query = supabase.table("picks").select("*").eq("entry_id", entry_id).eq("season_id", season_id).order("week").execute()
-        picks = picks_query.data if picks_query.data else []
-        
-        # Calcular estadísticas
-        total_wins = 0
-        total_losses = 0
-        current_streak = 0
-        longest_streak = 0
-        temp_streak = 0
-        status = "alive"
-        eliminated_week = None
-        loss_count = 0
-        
-        for pick in picks:
-            result = pick.get('result')
-            week = pick.get('week')
-            
-            # Normalizar valores antiguos y nuevos
-            if result in ['W', 'win']:
-                total_wins += 1
-                temp_streak += 1
-                longest_streak = max(longest_streak, temp_streak)
-            elif result in ['L', 'loss']:
-                total_losses += 1
-                loss_count += 1
-                temp_streak = 0  # Reset streak on loss
-                
-                # Lógica de eliminación
-                if loss_count == 1:
-                    status = "last_chance"
-                elif loss_count >= 2:
-                    status = "eliminated"
-                    eliminated_week = week
-                    break  # No procesar más picks después de eliminación
-            elif result in ['T', 'draw']:
-                # Empate no afecta racha pero tampoco la resetea
-                pass
-            # Si result es None o 'pending', no afecta las estadísticas
-        
-        # Current streak es la racha actual (solo si la última decisión fue victoria)
-        current_streak = 0
-        if picks:
-            # Contar victorias consecutivas desde el final
-            for pick in reversed(picks):
-                if pick.get('result') in ['W', 'win']:
-                    current_streak += 1
-                elif pick.get('result') in ['L', 'loss', 'T', 'draw']:
-                    break
-        
-        # Actualizar la entrada
-        update_data = {
-            "total_wins": total_wins,
-            "total_losses": total_losses,
-            "longest_streak": longest_streak,
-            "current_streak": current_streak,
-            "status": status,
-            "eliminated_week": eliminated_week,
-            "is_active": status != "eliminated"
-        }
+    # Todos los picks de la temporada, agrupados por entrada y ordenados por semana
+    season_picks = fetch_all_rows(
+        lambda: supabase.table("picks").select("id, entry_id, week, result").eq("season_id", season_id)
+    )
+    picks_by_entry = defaultdict(list)
+    for pick in season_picks:
+        picks_by_entry[pick['entry_id']].append(pick)
+    
+    changed_entries = []
+    for entry in entries:
+        picks = sorted(picks_by_entry.get(entry['id'], []), key=pick_order)
+        stats = compute_entry_stats(picks)
         
-        supabase.table("entries").update(update_data).eq("id", entry_id).execute()
-        entries_updated += 1
+        if all(entry.get(field) == stats[field] for field in fields):
+            continue
         
-        logger.info(f"Entry ID {entry_id}: W={total_wins}, L={total_losses}, "
-                   f"Current Streak={current_streak}, Longest={longest_streak}, Status={status}")
+        changed_entries.append({"id": entry['id'], **{field: stats[field] for field in fields}})
     
-    return entries_updated
+    if not changed_entries or dry_run:
+        return len(changed_entries)
+    written, _ = write_entry_statistics(changed_entries)
+    return written
+
+def update_entry_statistics_incremental(supabase, season_id, pick_results):
+    """
+    Actualiza solo las entradas con picks calificados en esta corrida (pick_results
+    de score_picks): los picks recién calificados se suman al estado guardado de la
+    entrada y solo se reproducen completas las entradas con un pick ya calificado
+    que cambió (ver _entry_rollup). Se llama antes de escribir los picks.
+    Regresa (entradas_actualizadas, reproducidas, ids_con_error).
+    """
+    entry_ids = sorted({pick['entry_id'] for pick in pick_results})
+    entries = []
+    for start in range(0, len(entry_ids), 200):
+        batch = entry_ids[start:start + 200]
+        entries.extend(fetch_all_rows(lambda: supabase.table("entries").select("*").eq("season_id", season_id).in_("id", batch)))
+    if not entries:
+        return 0, 0, set()
+    
+    changed_entries, replayed = rollup_entries(
+        entries, pick_results,
+        load_picks=lambda ids: load_entry_picks(supabase, season_id, ids),
+        track_state=has_rollup_state(entries)
+    )
+    if replayed:
+        logger.info(f"🔁 {len(replayed)} entradas reproducidas desde la semana 1")
+    if not changed_entries:
+        return 0, len(replayed), set()
+    written, failed_ids = write_entry_statistics(changed_entries)
+    return written, len(replayed), failed_ids
 
 # --- Actualización automática de picks según marcadores ---
-@app.post("/auto-update-picks")
-async def auto_update_picks():
+def pick_multiplier(pick, game_date):
     """
-    Actualiza automáticamente el campo result y los puntos de los picks pendientes según el marcador del partido, y actualiza las entradas.
+    Horas de anticipación con las que se hizo el pick:
+    - Si pick se hace DESPUÉS del partido (hours_diff <= 0): multiplier = 0
+    - Si pick se hace minutos ANTES (0 < hours_diff < 1): multiplier = 1
+    - Si pick se hace horas ANTES (hours_diff >= 1): multiplier = floor(hours_diff)
     """
+    if not game_date or not pick.get('created_at'):
+        return 0
+    # Convertir las fechas a UTC para comparación
     try:
-        # Obtener temporada y semana actual
-        season_query = supabase.table("seasons").select("*").eq("is_active", True).execute()
-        if not season_query.data:
-            raise HTTPException(status_code=404, detail="No hay temporada activa")
-        current_season = season_query.data[0]
-        season_id = current_season['id']
-        week_num = current_season.get('current_week', 1)
-
-        # Obtener todos los picks de la temporada actual hasta la semana actual, sin importar el valor de 'result'
-        picks_query = supabase.table("picks").select("*, match_id, selected_team_id, entry_id, week, created_at").eq("season_id", season_id).lte("week", week_num).execute()
-        picks = picks_query.data if picks_query.data else []
-        updated_count = 0
-        for pick in picks:
-            match_id = pick['match_id']
-            team_id = pick['selected_team_id']
-            entry_id = pick['entry_id']
-            week = pick['week']
-            # Obtener el partido con la hora del partido y el status
-            match_query = supabase.table("matches").select("home_team_id, away_team_id, home_score, away_score, game_date, status").eq("id", match_id).execute()
-            if not match_query.data:
-                continue
-            match = match_query.data[0]
-            home_id = match['home_team_id']
-            away_id = match['away_team_id']
-            home_score = match['home_score']
-            away_score = match['away_score']
-            game_date = match.get('game_date')
-            match_status = match.get('status', 'scheduled')
-
-            # VALIDACIÓN: Solo actualizar si el partido está completado
-            # Si el partido no está completado, marcar como pending
-            if match_status != 'completed':
-                if pick.get('result') != 'pending':
-                    supabase.table("picks").update({
-                        "result": "pending",
-                        "points_earned": 0
-                    }).eq("id", pick['id']).execute()
-                    logger.info(f"Pick ID {pick['id']}: Partido con status '{match_status}', resultado cambiado a 'pending'")
-                continue
-
-            # Si no hay marcador (aunque esté completed, por seguridad), poner pick en 'pending'
-            if home_score is None or away_score is None:
-                if pick.get('result') != 'pending':
-                    supabase.table("picks").update({
-                        "result": "pending",
-                        "points_earned": 0
-                    }).eq("id", pick['id']).execute()
-                    logger.info(f"Pick ID {pick['id']}: Partido sin marcador, resultado cambiado a 'pending'")
-                continue
+        if isinstance(game_date, str):
+            # Intentar primero formato ISO con 'T'
+            try:
+                match_time = datetime.strptime(game_date, "%Y-%m-%dT%H:%M:%S")
+            except ValueError:
+                # Si falla, intentar formato estándar
+                match_time = datetime.strptime(game_date, "%Y-%m-%d %H:%M:%S")
+        else:
+            match_time = game_date
+        match_time = pytz.utc.localize(match_time) if match_time.tzinfo is None else match_time
 
-            # Calcular el multiplicador basado en las horas de anticipación
-            multiplier = 0
-            if game_date and pick.get('created_at'):
-                # Convertir las fechas a UTC para comparación
+        if isinstance(pick['created_at'], str):
+            # Intentar diferentes formatos de fecha
+            try:
+                # Formato ISO con microsegundos
+                pick_time = datetime.strptime(pick['created_at'], "%Y-%m-%dT%H:%M:%S.%f")
+            except ValueError:
                 try:
-                    if isinstance(game_date, str):
-                        # Intentar primero formato ISO con 'T'
-                        try:
-                            match_time = datetime.strptime(game_date, "%Y-%m-%dT%H:%M:%S")
-                        except ValueError:
-                            # Si falla, intentar formato estándar
-                            match_time = datetime.strptime(game_date, "%Y-%m-%d %H:%M:%S")
-                    else:
-                        match_time = game_date
-                    match_time = pytz.utc.localize(match_time) if match_time.tzinfo is None else match_time
-
-                    if isinstance(pick['created_at'], str):
-                        # Intentar diferentes formatos de fecha
-                        try:
-                            # Formato ISO con microsegundos
-                            pick_time = datetime.strptime(pick['created_at'], "%Y-%m-%dT%H:%M:%S.%f")
-                        except ValueError:
-                            try:
-                                # Formato ISO sin microsegundos
-                                pick_time = datetime.strptime(pick['created_at'], "%Y-%m-%dT%H:%M:%S")
-                            except ValueError:
-                                # Formato estándar
-                                pick_time = datetime.strptime(pick['created_at'], "%Y-%m-%d %H:%M:%S")
-                    else:
-                        pick_time = pick['created_at']
-                    pick_time = pytz.utc.localize(pick_time) if pick_time.tzinfo is None else pick_time
-
-                    # Calcular horas de diferencia
-                    time_diff = match_time - pick_time
-                    hours_diff = time_diff.total_seconds() / 3600
-                    
-                    # Log para depuración
-                    logger.info(f"Pick ID {pick['id']}: Pick time={pick_time}, Match time={match_time}, Hours diff={hours_diff:.2f}")
-                    
-                    # Lógica especial del multiplicador:
-                    # - Si pick se hace DESPUÉS del partido (hours_diff <= 0): multiplier = 0
-                    # - Si pick se hace minutos ANTES (0 < hours_diff < 1): multiplier = 1
-                    # - Si pick se hace horas ANTES (hours_diff >= 1): multiplier = floor(hours_diff)
-                    if hours_diff <= 0:
-                        # Pick después del partido
-                        multiplier = 0
-                        logger.info(f"  → Pick made AFTER game: multiplier = 0")
-                    elif hours_diff < 1:
-                        # Pick minutos antes (0 < hours < 1)
-                        multiplier = 1
-                        logger.info(f"  → Pick made minutes before game: multiplier = 1")
-                    else:
-                        # Pick horas antes (hours >= 1)
-                        multiplier = floor(hours_diff)
-                        logger.info(f"  → Pick made {floor(hours_diff)} hours before game: multiplier = {multiplier}")
-                except Exception as e:
-                    logger.error(f"Error calculando multiplicador para pick {pick['id']}: {e}")
-                    multiplier = 0
-
-            # Determinar resultado
-            if home_score > away_score:
-                winner_id = home_id
-            elif home_score < away_score:
-                winner_id = away_id
-            else:
-                winner_id = None  # Empate
+                    # Formato ISO sin microsegundos
+                    pick_time = datetime.strptime(pick['created_at'], "%Y-%m-%dT%H:%M:%S")
+                except ValueError:
+                    # Formato estándar
+                    pick_time = datetime.strptime(pick['created_at'], "%Y-%m-%d %H:%M:%S")
+        else:
+            pick_time = pick['created_at']
+        pick_time = pytz.utc.localize(pick_time) if pick_time.tzinfo is None else pick_time
 
-            # Calcular result
-            if winner_id is None:
-                result = 'T'
-            elif team_id == winner_id:
-                result = 'W'
-            else:
-                result = 'L'
+        # Calcular horas de diferencia
+        hours_diff = (match_time - pick_time).total_seconds() / 3600
+    except Exception as e:
+        logger.error(f"Error calculando multiplicador para pick {pick.get('id')}: {e}")
+        return 0
 
-            # Calcular puntos basados en el resultado y multiplicador
-            if result == 'W':
-                points_earned = int(1.0 * multiplier)
-            elif result == 'T':
-                points_earned = int(0.5 * multiplier)
-            else:  # result == 'L'
-                # Pérdida: restar 300 puntos fijos (sin multiplicador)
-                points_earned = -300
+    if hours_diff <= 0:
+        # Pick después del partido
+        return 0
+    if hours_diff < 1:
+        # Pick minutos antes (0 < hours < 1)
+        return 1
+    # Pick horas antes (hours >= 1)
+    return floor(hours_diff)
 
-            # Actualizar pick con resultado y puntos
+def compute_pick_result(pick, match):
+    """
+    Regresa (result, points_earned) del pick según el partido.
+    Si el partido no está completado o no tiene marcador el pick queda 'pending'.
+    """
+    # VALIDACIÓN: Solo calificar si el partido está completado
+    if match.get('status', 'scheduled') != 'completed':
+        return 'pending', 0
+
+    # Si no hay marcador (aunque esté completed, por seguridad), poner pick en 'pending'
+    home_score = match['home_score']
+    away_score = match['away_score']
+    if home_score is None or away_score is None:
+        return 'pending', 0
+
+    # Determinar resultado
+    if home_score > away_score:
+        winner_id = match['home_team_id']
+    elif home_score < away_score:
+        winner_id = match['away_team_id']
+    else:
+        winner_id = None  # Empate
+
+    # Calcular result
+    if winner_id is None:
+        result = 'T'
+    elif pick['selected_team_id'] == winner_id:
+        result = 'W'
+    else:
+        result = 'L'
+
+    # Calcular puntos basados en el resultado y multiplicador
+    multiplier = pick_multiplier(pick, match.get('game_date'))
+    if result == 'W':
+        points_earned = int(1.0 * multiplier)
+    elif result == 'T':
+        points_earned = int(0.5 * multiplier)
+    else:  # result == 'L'
+        # Pérdida: restar 300 puntos fijos (sin multiplicador)
+        points_earned = -300
+    return result, points_earned
+
+def pick_needs_write(pick, result, points_earned):
+    """True si el resultado calculado difiere de lo guardado en el pick."""
+    if result == 'pending':
+        # Un pick pendiente solo se reescribe si tenía otro resultado
+        return pick.get('result') != 'pending'
+    return pick.get('result') != result or pick.get('points_earned') != points_earned
+
+def write_pick_results(changes):
+    """
+    Escribe los resultados agrupando los picks por (result, points_earned): un
+    update(...).in_("id", ids) por grupo. Regresa (picks_escritos, consultas).
+    """
+    groups = defaultdict(list)
+    for pick_id, result, points_earned in changes:
+        groups[(result, points_earned)].append(pick_id)
+
+    written = 0
+    queries = 0
+    for (result, points_earned), pick_ids in groups.items():
+        for start in range(0, len(pick_ids), 200):
+            batch = pick_ids[start:start + 200]
             supabase.table("picks").update({
-                "result": result, 
+                "result": result,
                 "points_earned": points_earned
-            }).eq("id", pick['id']).execute()
-            
-            logger.info(f"Pick ID {pick['id']}: Resultado={result}, Horas de anticipación={multiplier}, " \
-                      f"Puntos ganados/perdidos={points_earned}, Semana={week}")
-                      
-            updated_count += 1
-        # Actualizar estadísticas de entradas
-        entries_updated = update_entry_statistics(supabase, season_id)
+            }).in_("id", batch).execute()
+            queries += 1
+            written += len(batch)
+            logger.info(f"✏️ {len(batch)} picks -> result={result}, points_earned={points_earned}")
+    return written, queries
+
+# Igual que v_safety_lag en score_season_picks
+SCORING_SAFETY_LAG = timedelta(minutes=5)
+
+def parse_timestamp(value):
+    """Convierte un timestamp de Supabase a datetime con zona (sin zona se asume UTC)."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else pytz.utc.localize(parsed)
+
+def score_picks(season_id, week_num, dry_run=False, since=None):
+    """
+    Califica en Python los picks de la temporada hasta week_num (misma lógica que la
+    función score_season_picks de Postgres). Con dry_run solo cuenta los picks que
+    cambiarían, sin escribir.
+    
+    Con since (marca seasons.picks_scored_through) solo se cargan los picks de
+    partidos con updated_at igual o posterior a la marca, más los picks aún
+    pendientes. Los partidos justo en la marca se vuelven a leer (recalificarlos
+    no escribe nada) para no perder uno escrito en el mismo instante.
+    'scored_through' es la nueva marca: el mayor updated_at de los partidos
+    considerados, como máximo SCORING_SAFETY_LAG antes de ahora (un partido
+    escrito en esa ventana se vuelve a leer en la siguiente corrida). 'changes' son las escrituras pendientes (con dry_run) y
+    'pick_results' los picks calificados o que cambiaron (resultado anterior y
+    nuevo) para el rollup incremental de entradas.
+    """
+    match_columns = "id, home_team_id, away_team_id, home_score, away_score, game_date, status, updated_at"
+    query_count = 0
+    matches_by_id = {}
+    
+    def season_picks():
+        return supabase.table("picks").select("*, match_id, selected_team_id, entry_id, week, created_at").eq("season_id", season_id).lte("week", week_num)
+    
+    if since is None:
+        # Obtener todos los picks de la temporada actual hasta la semana actual, sin importar el valor de 'result'
+        picks = fetch_all_rows(season_picks)
+    else:
+        changed_query = supabase.table("matches").select(match_columns).eq("season_id", season_id).lte("week", week_num).gte("updated_at", since).execute()
+        query_count += 1
+        matches_by_id = {m['id']: m for m in changed_query.data or []}
+        pick_filter = "result.eq.pending,result.is.null"
+        if matches_by_id:
+            pick_filter = f"match_id.in.({','.join(str(match_id) for match_id in sorted(matches_by_id))}),{pick_filter}"
+        picks = fetch_all_rows(lambda: season_picks().or_(pick_filter))
+    query_count += len(picks) // 1000 + 1  # páginas de picks
+    
+    # La marca solo avanza con los partidos leídos como cambiados (o todos en modo completo)
+    mark_candidates = list(matches_by_id.values())
+    
+    # Cargar de una vez los partidos referenciados por los picks que aún no se tienen
+    match_ids = sorted({p['match_id'] for p in picks if p.get('match_id') is not None} - matches_by_id.keys())
+    if match_ids:
+        matches_query = supabase.table("matches").select(match_columns).in_("id", match_ids).execute()
+        query_count += 1
+        loaded = matches_query.data or []
+        matches_by_id.update({m['id']: m for m in loaded})
+        if since is None:
+            mark_candidates.extend(loaded)
+    
+    marks = [parse_timestamp(m.get('updated_at')) for m in mark_candidates]
+    marks = [mark for mark in marks if mark]
+    previous_mark = parse_timestamp(since)
+    if previous_mark:
+        marks.append(previous_mark)
+    # Margen detrás de ahora: updated_at se fija antes de que la escritura haga commit.
+    # La marca nunca retrocede
+    scored_through = None
+    if marks:
+        scored_through = min(max(marks), datetime.now(pytz.utc) - SCORING_SAFETY_LAG)
+        scored_through = max(scored_through, previous_mark or scored_through).isoformat()
+    
+    # Calcular el resultado de cada pick y quedarse solo con los que cambiaron
+    changes = []
+    pick_results = []
+    for pick in picks:
+        match = matches_by_id.get(pick['match_id'])
+        if not match:
+            continue
+        result, points_earned = compute_pick_result(pick, match)
+        if result != 'pending' or pick.get('result') != result:
+            pick_results.append({"id": pick['id'], "entry_id": pick['entry_id'], "week": pick['week'],
+                                 "previous": pick.get('result'), "result": result})
+        if pick_needs_write(pick, result, points_earned):
+            changes.append((pick['id'], result, points_earned))
+            logger.info(f"Pick ID {pick['id']}: {pick.get('result')} -> {result}, "
+                        f"Puntos={points_earned}, Semana={pick['week']}")
+    
+    if dry_run:
+        updated_count = len(changes)
+    else:
+        updated_count, write_queries = write_pick_results(changes)
+        query_count += write_queries
+    
+    return {
+        "picks_updated": updated_count,
+        "picks_unchanged": len(picks) - len(changes),
+        "picks_loaded": len(picks),
+        "matches_loaded": len(matches_by_id),
+        "scored_through": scored_through,
+        "changes": changes,
+        "pick_results": pick_results,
+        "query_count": query_count
+    }
+
+def save_scoring_watermark(season_id, scored_through, previous):
+    """
+    Guarda seasons.picks_scored_through. Si la columna aún no existe (migración
+    pendiente) solo se registra: la siguiente corrida vuelve a ser completa.
+    """
+    if not scored_through or parse_timestamp(scored_through) == parse_timestamp(previous):
+        return False
+    try:
+        supabase.table("seasons").update({"picks_scored_through": scored_through}).eq("id", season_id).execute()
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo guardar picks_scored_through ({e})")
+        return False
+    active_season.invalidate()
+    return True
+
+class AutoUpdatePicksRequest(BaseModel):
+    use_rpc: bool = True
+    cross_check: bool = False
+    full: bool = False
+
+@app.post("/auto-update-picks")
+async def auto_update_picks(body: AutoUpdatePicksRequest = Body(None)):
+    """
+    Actualiza automáticamente el campo result y los puntos de los picks pendientes según el marcador del partido, y actualiza las entradas.
+    
+    Por defecto todo se hace en Postgres con una sola llamada a la función
+    score_season_picks (supabase/migrations), con el cliente de service_role
+    (SUPABASE_SERVICE_ROLE_KEY). Si no hay llave, la función no existe o falla, se usa
+    el camino en Python: partidos cargados en una sola consulta y solo los picks y
+    entradas que cambiaron se escriben por lote ('query_count' reporta las consultas).
+    
+    Con {"cross_check": true} después del RPC se recalcula todo en Python sin escribir;
+    'cross_check' reporta cuántos picks/entradas difieren (deben ser 0).
+    
+    La calificación es incremental: seasons.picks_scored_through guarda el mayor
+    matches.updated_at ya calificado y solo se recalculan los picks de partidos que
+    cambiaron después (más los pendientes). {"full": true} ignora la marca y
+    recalifica toda la temporada (auditorías); la marca se actualiza igual.
+    
+    En Python las entradas se actualizan de forma incremental a partir de los picks
+    que cambiaron (se escriben antes que los picks); con full=true se reconstruyen
+    todas desde sus picks.
+    """
+    try:
+        use_rpc = body.use_rpc if body else True
+        cross_check = body.cross_check if body else False
+        full = body.full if body else False
+        
+        # Obtener temporada y semana actual
+        current_season = active_season.get()
+        if not current_season:
+            raise HTTPException(status_code=404, detail="No hay temporada activa")
+        season_id = current_season['id']
+        week_num = current_season.get('current_week', 1)
+        # Una marca vieja (cache de otra instancia) solo hace que se recalifique de más
+        previous_mark = current_season.get('picks_scored_through')
+        since = None if full else previous_mark
+        mode = "incremental" if since else "full"
+        
+        if use_rpc and not supabase_admin:
+            logger.warning("⚠️ Sin SUPABASE_SERVICE_ROLE_KEY no se puede llamar score_season_picks; usando cálculo en Python")
+        elif use_rpc:
+            data = None
+            try:
+                # La función lee la marca de seasons; solo se le indica si es auditoría
+                rpc_params = {"p_season_id": season_id, "p_week": week_num, "p_full": full}
+                rpc_result = supabase_admin.rpc("score_season_picks", rpc_params).execute()
+                data = rpc_result.data or {}  # type: ignore
+                if isinstance(data, list):
+                    data = data[0] if data else {}
+            except Exception as e:
+                logger.warning(f"⚠️ RPC score_season_picks no disponible ({e}); usando cálculo en Python")
+            
+            if data is not None:
+                # El RPC ya escribió: de aquí en adelante nunca se cae al camino en Python
+                if data.get("scored_through") != previous_mark:
+                    active_season.invalidate()
+                response = {
+                    "status": "success",
+                    "engine": "rpc",
+                    "mode": mode,
+                    "picks_updated": data.get("picks_updated", 0),
+                    "entries_updated": data.get("entries_updated", 0),
+                    "scored_through": data.get("scored_through"),
+                    "query_count": 2,
+                    "detail": "Picks y entradas actualizados automáticamente"
+                }
+                if cross_check:
+                    # Sobre el estado que dejó el RPC: los mismos picks que calificó
+                    # (misma marca) y todas las entradas deben coincidir con Python
+                    try:
+                        picks_check = score_picks(season_id, week_num, dry_run=True, since=since)
+                        entries_check = update_entry_statistics(supabase, season_id, dry_run=True)
+                        response["cross_check"] = {
+                            "picks_mismatched": picks_check["picks_updated"],
+                            "entries_mismatched": entries_check,
+                            "ok": picks_check["picks_updated"] == 0 and entries_check == 0
+                        }
+                        if not response["cross_check"]["ok"]:
+                            logger.warning(f"⚠️ score_season_picks difiere del cálculo en Python: {response['cross_check']}")
+                    except Exception as e:
+                        logger.error(f"❌ Error en cross_check de score_season_picks: {e}")
+                        response["cross_check"] = {"ok": False, "error": str(e)}
+                return response
+        
+        entries_replayed = None
+        entries_failed = set()
+        if full:
+            # Auditoría: picks primero y después todas las entradas desde sus picks
+            picks_result = score_picks(season_id, week_num)
+            picks_updated = picks_result["picks_updated"]
+            entries_updated = update_entry_statistics(supabase, season_id)
+        else:
+            # Entradas primero: si la corrida se interrumpe, los picks siguen sin escribir
+            # y la siguiente corrida vuelve a ver los mismos cambios
+            picks_result = score_picks(season_id, week_num, dry_run=True, since=since)
+            entries_updated, entries_replayed, entries_failed = update_entry_statistics_incremental(
+                supabase, season_id, picks_result["pick_results"]
+            )
+            # Los picks de entradas que no se pudieron escribir se quedan para la siguiente corrida
+            held_back = {p['id'] for p in picks_result["pick_results"] if p['entry_id'] in entries_failed}
+            picks_updated, write_queries = write_pick_results(
+                [change for change in picks_result["changes"] if change[0] not in held_back]
+            )
+            picks_result["query_count"] += write_queries
+        
+        # La marca avanza solo después de escribir picks y entradas sin errores
+        watermark_saved = not entries_failed and save_scoring_watermark(season_id, picks_result["scored_through"], previous_mark)
         return {
             "status": "success", 
-            "picks_updated": updated_count, 
+            "engine": "python",
+            "mode": mode,
+            "picks_updated": picks_updated, 
+            "picks_unchanged": picks_result["picks_unchanged"],
+            "picks_loaded": picks_result["picks_loaded"],
             "entries_updated": entries_updated,
+            "entries_replayed": entries_replayed,
+            "entries_failed": sorted(entries_failed),
+            "matches_loaded": picks_result["matches_loaded"],
+            "scored_through": picks_result["scored_through"],
+            "query_count": 1 + picks_result["query_count"] + (1 if watermark_saved else 0),
             "detail": "Picks y entradas actualizados automáticamente"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error en auto_update_picks: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1532,7 +1858,7 @@ async def daily_update():
         # Paso 2: Actualizar picks (solo si update-matches tuvo éxito)
         logger.info("🎯 DAILY UPDATE: Ejecutando auto-update-picks")
         try:
-            picks_result = await auto_update_picks()
+            picks_result = await auto_update_picks(body=AutoUpdatePicksRequest())
             results["auto_update_picks"] = {
                 "status": "success",
                 "data": picks_result
@@ -1567,11 +1893,10 @@ async def update_weekly_odds_auto():
         logger.info("🎲 AUTO ODDS UPDATE: Iniciando actualización automática de odds")
         
         # Obtener temporada activa y semana actual
-        season_query = supabase.table("seasons").select("*").eq("is_active", True).execute()
-        if not season_query.data:
+        current_season = active_season.get()
+        if not current_season:
             raise HTTPException(status_code=404, detail="No hay temporada activa")
         
-        current_season = season_query.data[0]
         current_week = current_season.get('current_week', 1)
         
         logger.info(f"🎲 AUTO ODDS UPDATE: Actualizando odds para semana {current_week}")
@@ -1613,6 +1938,10 @@ async def auto_assign_last_game_picks():
        c. Si ningún equipo ha perdido (entrada sin pérdidas), asigna el away_team de todas formas
     4. El pick se marca como automático con created_at = game_date (así multiplicador = 1)
     
+    Los picks de la temporada se cargan en una sola consulta y todos los picks automáticos
+    se insertan en un solo insert; si el lote falla se reintenta pick por pick y los
+    errores de cada entrada quedan en 'assignments'.
+    
     Multiplicador:
     - Como created_at = game_date, la diferencia es 0 horas
     - floor(0) = 0, pero necesitamos multiplicador = 1
@@ -1623,12 +1952,11 @@ async def auto_assign_last_game_picks():
         logger.info("🎯 AUTO ASSIGN PICKS: Iniciando asignación automática de picks")
         
         # Obtener temporada activa
-        season_query = supabase.table("seasons").select("*").eq("is_active", True).execute()
-        if not season_query.data:
+        current_season = active_season.get()
+        if not current_season:
             logger.error("No hay temporada activa")
             raise HTTPException(status_code=404, detail="No hay temporada activa")
         
-        current_season = season_query.data[0]
         season_id = current_season['id']
         current_week = current_season.get('current_week', 1)
         
@@ -1654,13 +1982,35 @@ async def auto_assign_last_game_picks():
         
         logger.info(f"🏈 Last match of week: ID={last_match_id}, Away team={away_team_id}, Game time={game_date}")
         
-        # PASO 2: Obtener todas las entradas activas de esta semana que NO tengan pick
-        # Primero, obtener todos los entry_ids que YA tienen pick para esta semana
-        existing_picks_query = supabase.table("picks").select(
-            "entry_id"
-        ).eq("season_id", season_id).eq("week", current_week).execute()
+        # La clave es que created_at < game_date por 1 minuto, para que el multiplicador sea 1.
+        # Se valida una sola vez antes de cargar picks: sin fecha válida no se asigna nada
+        try:
+            game_datetime = datetime.fromisoformat(game_date.replace('Z', '+00:00')) if isinstance(game_date, str) else game_date
+            pick_datetime = game_datetime - timedelta(minutes=1)  # 1 minuto antes
+        except (AttributeError, TypeError, ValueError) as e:
+            logger.error(f"❌ game_date inválido en el partido {last_match_id}: {game_date!r} ({e})")
+            raise HTTPException(
+                status_code=422,
+                detail=f"El partido {last_match_id} (último de la semana {current_week}) tiene game_date inválido: {game_date!r}"
+            )
         
-        entry_ids_with_picks = set([p['entry_id'] for p in existing_picks_query.data]) if existing_picks_query.data else set()
+        # PASO 2: Obtener todas las entradas activas de esta semana que NO tengan pick
+        # Todos los picks de la temporada en una sola consulta: de aquí salen las entradas
+        # que ya tienen pick esta semana y los equipos usados/perdidos de cada entrada
+        season_picks = fetch_all_rows(
+            lambda: supabase.table("picks").select("id, entry_id, selected_team_id, week, result").eq("season_id", season_id)
+        )
+        
+        entry_ids_with_picks = set()
+        used_teams_by_entry = defaultdict(set)  # equipos usados en semanas anteriores
+        lost_picks_by_entry = defaultdict(list)  # picks perdidos, en orden de id
+        for p in season_picks:
+            if p['week'] == current_week:
+                entry_ids_with_picks.add(p['entry_id'])
+            else:
+                used_teams_by_entry[p['entry_id']].add(p['selected_team_id'])
+            if p.get('result') == 'L':
+                lost_picks_by_entry[p['entry_id']].append(p)
         logger.info(f"Entradas con picks en semana {current_week}: {len(entry_ids_with_picks)}")
         
         # Obtener todas las entradas activas
@@ -1687,21 +2037,11 @@ async def auto_assign_last_game_picks():
                 "picks_assigned": 0
             }
         
-        # PASO 3: Asignar picks automáticamente
-        picks_assigned = 0
-        assignment_details = []
-        
+        # PASO 3: Decidir el equipo de cada entrada en memoria
+        pending_picks = []  # (pick_data, assignment_reason)
         for entry in entries_without_picks:
             entry_id = entry['id']
-            logger.info(f"\n📌 Processing entry {entry_id}")
-            
-            # Obtener todos los equipos usados por esta entrada en semanas anteriores
-            used_teams_query = supabase.table("picks").select(
-                "selected_team_id"
-            ).eq("entry_id", entry_id).neq("week", current_week).execute()
-            
-            used_team_ids = set([p['selected_team_id'] for p in used_teams_query.data]) if used_teams_query.data else set()
-            logger.info(f"   Teams previously used: {used_team_ids}")
+            used_team_ids = used_teams_by_entry.get(entry_id, set())
             
             # Determinar qué equipo asignar
             assigned_team_id = away_team_id
@@ -1709,29 +2049,17 @@ async def auto_assign_last_game_picks():
             
             # Si el away_team ya fue usado, buscar un equipo que haya perdido
             if away_team_id in used_team_ids:
-                logger.info(f"   Away team {away_team_id} ya fue usado, buscando equipo que perdió...")
-                
-                # Obtener picks perdedores de esta entrada en semanas anteriores
-                lost_picks_query = supabase.table("picks").select(
-                    "selected_team_id, week"
-                ).eq("entry_id", entry_id).eq("result", "L").execute()
-                
-                if lost_picks_query.data:
+                lost_picks = lost_picks_by_entry.get(entry_id)
+                if lost_picks:
                     # Tomar el primer equipo que perdió
-                    assigned_team_id = lost_picks_query.data[0]['selected_team_id']
-                    lost_week = lost_picks_query.data[0]['week']
+                    assigned_team_id = lost_picks[0]['selected_team_id']
+                    lost_week = lost_picks[0]['week']
                     assignment_reason = f"lost_team_from_week_{lost_week}"
-                    logger.info(f"   Asignando team {assigned_team_id} que perdió en semana {lost_week}")
                 else:
-                    logger.info(f"   Sin equipos que hayan perdido, manteniendo away_team {away_team_id}")
                     assignment_reason = "away_team_no_losses"
+            logger.info(f"📌 Entry {entry_id}: team {assigned_team_id} ({assignment_reason})")
             
-            # PASO 4: Crear el pick automático
-            # La clave es que created_at < game_date por 1 minuto, para que el multiplicador sea 1
-            game_datetime = datetime.fromisoformat(game_date.replace('Z', '+00:00')) if isinstance(game_date, str) else game_date
-            pick_datetime = game_datetime - timedelta(minutes=1)  # 1 minuto antes
-            
-            pick_data = {
+            pending_picks.append(({
                 "entry_id": entry_id,
                 "match_id": last_match_id,
                 "selected_team_id": assigned_team_id,
@@ -1740,34 +2068,47 @@ async def auto_assign_last_game_picks():
                 "confidence": 1,  # Auto-assigned (minimum valid value)
                 "result": "pending",
                 "created_at": pick_datetime.isoformat()
-            }
-            
-            try:
-                insert_result = supabase.table("picks").insert(pick_data).execute()
-                if insert_result.data:
-                    picks_assigned += 1
-                    assignment_details.append({
-                        "entry_id": entry_id,
-                        "team_id": assigned_team_id,
-                        "reason": assignment_reason,
-                        "match_id": last_match_id,
-                        "week": current_week,
-                        "status": "success"
-                    })
-                    logger.info(f"   ✅ Pick asignado a entry {entry_id}: team {assigned_team_id} ({assignment_reason})")
-                else:
-                    logger.error(f"   ❌ Error insertando pick para entry {entry_id}")
-                    assignment_details.append({
-                        "entry_id": entry_id,
-                        "status": "error",
-                        "message": "Insert failed"
-                    })
-            except Exception as e:
-                logger.error(f"   ❌ Exception asignando pick a entry {entry_id}: {e}")
+            }, assignment_reason))
+        
+        # PASO 4: Crear todos los picks automáticos en un solo insert
+        picks_assigned = 0
+        assignment_details = []
+        row_errors = {}  # entry_id -> mensaje
+        inserted_entry_ids = set()
+        
+        try:
+            insert_result = supabase.table("picks").insert([pick for pick, _ in pending_picks]).execute()
+            inserted_entry_ids = {row['entry_id'] for row in insert_result.data or []}
+        except Exception as e:
+            # Si falla el lote, insertar fila por fila para saber cuáles entradas fallan
+            logger.warning(f"⚠️ Insert en bloque falló ({e}); reintentando pick por pick")
+            for pick_data, _ in pending_picks:
+                try:
+                    row_result = supabase.table("picks").insert(pick_data).execute()
+                    if row_result.data:
+                        inserted_entry_ids.add(pick_data['entry_id'])
+                except Exception as row_error:
+                    row_errors[pick_data['entry_id']] = str(row_error)
+        
+        for pick_data, assignment_reason in pending_picks:
+            entry_id = pick_data['entry_id']
+            if entry_id in inserted_entry_ids:
+                picks_assigned += 1
+                assignment_details.append({
+                    "entry_id": entry_id,
+                    "team_id": pick_data['selected_team_id'],
+                    "reason": assignment_reason,
+                    "match_id": last_match_id,
+                    "week": current_week,
+                    "status": "success"
+                })
+            else:
+                message = row_errors.get(entry_id, "Insert failed")
+                logger.error(f"   ❌ Error insertando pick para entry {entry_id}: {message}")
                 assignment_details.append({
                     "entry_id": entry_id,
                     "status": "error",
-                    "message": str(e)
+                    "message": message
                 })
         
         logger.info(f"\n✅ AUTO ASSIGN PICKS COMPLETADO: {picks_assigned} picks asignados")
@@ -1783,6 +2124,8 @@ async def auto_assign_last_game_picks():
             "assignments": assignment_details
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ AUTO ASSIGN PICKS ERROR: {e}")
         raise HTTPException(status_code=500, detail=f"Error en auto-assign-last-game-picks: {str(e)}")
@@ -1799,11 +2142,10 @@ async def get_auto_assign_schedule():
         logger.info("🕐 GET SCHEDULE: Calculando tiempo de ejecución")
         
         # Obtener temporada activa
-        season_query = supabase.table("seasons").select("*").eq("is_active", True).execute()
-        if not season_query.data:
+        current_season = active_season.get()
+        if not current_season:
             raise HTTPException(status_code=404, detail="No hay temporada activa")
         
-        current_season = season_query.data[0]
         season_id = current_season['id']
         current_week = current_season.get('current_week', 1)
         
@@ -1880,11 +2222,10 @@ async def schedule_weekly_auto_assign():
         logger.info("🗓️ PROGRAMANDO AUTO-ASSIGN SEMANAL...")
         
         # Obtener temporada activa y semana actual
-        season_query = supabase.table("seasons").select("*").eq("is_active", True).execute()
-        if not season_query.data:
+        current_season = active_season.get()
+        if not current_season:
             return {"error": "No hay temporada activa", "schedule": None}
         
-        current_season = season_query.data[0]
         season_id = current_season['id']
         current_week = current_season.get('current_week', 1)
         
@@ -1957,60 +2298,62 @@ async def schedule_weekly_auto_assign():
 
 
 # --- ENDPOINT: UPDATE LIVE SCORES ---
+
+def match_state_fingerprint(home_score, away_score, status):
+    """Huella del estado de un partido para detectar si cambió respecto a la BD"""
+    return (validate_score(home_score), validate_score(away_score), status)
+
 @app.post("/update-live-scores")
 async def update_live_scores():
     """
     Actualiza los scores en vivo de los partidos de la NFL consultando RapidAPI.
     Solo actualiza los partidos que estén en la respuesta de RapidAPI.
+    Si el marcador y el status son iguales a los de la fila en la BD, el partido
+    no se vuelve a escribir (se reporta en 'matches_skipped').
+    Los partidos de la semana se cargan una sola vez por ejecución. Solo se escriben
+    las columnas del marcador en vivo (scores, status, updated_at) para no revertir
+    cambios concurrentes de fecha u otras columnas del partido; los completados van
+    en un solo update.
     """
     try:
         logger.info("🔄 INICIANDO: Actualización de scores en vivo")
         
-        # Obtener todos los equipos de la base de datos
-        teams_query = supabase.table("teams").select("id, name, abbreviation, city").execute()
-        if not teams_query.data:
+        # Directorio de equipos (en memoria). RapidAPI usa shortName como "Cowboys", "Cardinals", etc.
+        teams = get_team_directory()
+        if not teams:
             raise HTTPException(status_code=404, detail="No hay equipos en la base de datos")
         
-        teams = teams_query.data
-        
-        # Crear mapeo de nombres de equipos (shortName de RapidAPI -> team_id local)
-        # RapidAPI usa shortName como "Cowboys", "Cardinals", etc.
-        team_mapping = {}
-        for team in teams:
-            # Mapear por nombre del equipo (ej: "Cowboys" -> id)
-            team_mapping[team['name']] = team['id']
-            # También mapear por abreviación por si acaso
-            team_mapping[team['abbreviation']] = team['id']
-        
-        logger.info(f"📊 Equipos mapeados: {len(team_mapping)}")
-        
         # Consultar RapidAPI para obtener scores en vivo
-        api_url = f"{BASE_URL}/nfl-livescores"
-        headers = {
-            'X-RapidAPI-Key': RAPIDAPI_KEY,
-            'X-RapidAPI-Host': RAPIDAPI_HOST
-        }
-        
         logger.info(f"📡 Consultando RapidAPI para scores en vivo...")
-        api_resp = requests.get(api_url, headers=headers, timeout=20)
-        
-        if api_resp.status_code != 200:
-            logger.error(f"❌ Error al consultar RapidAPI: {api_resp.status_code}")
+        try:
+            live_data = nfl_client.live_scores()
+        except (CircuitOpenError, requests.exceptions.Timeout, requests.exceptions.ConnectionError) as ce:
+            # RapidAPI no responde y no hay payload previo: fallar rápido
+            logger.warning(f"⚠️ {ce}")
+            return {
+                "status": "upstream_unavailable",
+                "message": str(ce),
+                "matches_updated": 0,
+                "upstream_degraded": True
+            }
+        except requests.exceptions.HTTPError as he:
+            status_code = he.response.status_code if he.response is not None else None
+            logger.error(f"❌ Error al consultar RapidAPI: {status_code}")
             return {
                 "status": "error",
-                "message": f"RapidAPI returned status code {api_resp.status_code}",
+                "message": f"RapidAPI returned status code {status_code}",
                 "matches_updated": 0
             }
         
-        live_data = api_resp.json()
-        
         # Verificar si RapidAPI responde con el mensaje de "no hay partidos en vivo"
         if isinstance(live_data, dict) and live_data.get('msg') == "There are no live NFL matches happening right now.":
             logger.info("ℹ️  RapidAPI reporta: No hay partidos en vivo en este momento")
             return {
                 "status": "no_live_matches",
                 "message": live_data.get('msg'),
-                "matches_updated": 0
+                "matches_updated": 0,
+                "stale": live_data.get('stale', False),
+                "age_seconds": live_data.get('age_seconds')
             }
         
         live_matches = live_data.get('live', [])
@@ -2020,32 +2363,41 @@ async def update_live_scores():
             return {
                 "status": "no_live_matches",
                 "message": "No hay partidos en vivo",
-                "matches_updated": 0
+                "matches_updated": 0,
+                "stale": live_data.get('stale', False),
+                "age_seconds": live_data.get('age_seconds')
             }
         
         logger.info(f"🏈 Partidos en vivo encontrados: {len(live_matches)}")
         
         # Obtener temporada activa
-        season_query = supabase.table("seasons").select("*").eq("is_active", True).execute()
-        if not season_query.data:
+        current_season = active_season.get()
+        if not current_season:
             raise HTTPException(status_code=404, detail="No hay temporada activa")
         
-        current_season = season_query.data[0]
         season_id = current_season['id']
         current_week = current_season.get('current_week', 1)
         
         matches_updated = 0
         matches_completed = 0
+        matches_skipped = 0
         update_details = []
         
-        # Primero, obtener todos los partidos que estaban en progreso
-        in_progress_query = supabase.table("matches").select("id, home_team_id, away_team_id").eq(
+        # Cargar una sola vez los partidos de la semana, indexados por (home_team_id, away_team_id)
+        week_matches_query = supabase.table("matches").select("*").eq(
             "season_id", season_id
-        ).eq("week", current_week).eq("status", "in_progress").execute()
+        ).eq("week", current_week).execute()
+        week_matches = week_matches_query.data if week_matches_query.data else []
+        matches_by_pair = {(m['home_team_id'], m['away_team_id']): m for m in week_matches}
         
-        in_progress_matches = in_progress_query.data if in_progress_query.data else []
+        # Partidos que estaban en progreso
+        in_progress_matches = [m for m in week_matches if m.get('status') == 'in_progress']
         live_match_ids = set()
         
+        now_iso = utc_timestamp()
+        pending_writes = []  # (match_id, marcador en vivo, detalle)
+        completed_writes = []  # (match_id, detalle)
+        
         # Procesar cada partido en vivo
         for live_match in live_matches:
             try:
@@ -2059,46 +2411,47 @@ async def update_live_scores():
                 away_score = away_competitor.get('score', 0)
                 
                 # Buscar IDs de equipos locales
-                home_team_id = team_mapping.get(home_team_name)
-                away_team_id = team_mapping.get(away_team_name)
+                home_team = teams.resolve(home_team_name)
+                away_team = teams.resolve(away_team_name)
+                home_team_id = home_team['id'] if home_team else None
+                away_team_id = away_team['id'] if away_team else None
                 
                 if not home_team_id or not away_team_id:
                     logger.warning(f"⚠️ No se pudo mapear equipos: {home_team_name} vs {away_team_name}")
                     continue
                 
-                # Buscar el partido en la base de datos
-                match_query = supabase.table("matches").select("id, home_score, away_score").eq(
-                    "season_id", season_id
-                ).eq("week", current_week).eq(
-                    "home_team_id", home_team_id
-                ).eq("away_team_id", away_team_id).execute()
-                
-                if not match_query.data:
+                # Buscar el partido en el índice de la semana
+                match = matches_by_pair.get((home_team_id, away_team_id))
+                if not match:
                     logger.warning(f"⚠️ Partido no encontrado en BD: {home_team_name} vs {away_team_name}")
                     continue
                 
-                match = match_query.data[0]
                 match_id = match['id']
                 live_match_ids.add(match_id)
                 
+                # Saltar la escritura si el estado es igual al de la fila en la BD
+                new_fingerprint = match_state_fingerprint(home_score, away_score, "in_progress")
+                stored_fingerprint = match_state_fingerprint(
+                    match.get('home_score'), match.get('away_score'), match.get('status')
+                )
+                if new_fingerprint == stored_fingerprint:
+                    matches_skipped += 1
+                    logger.info(f"   ⏭️ Sin cambios: {home_team_name} {home_score} - {away_score} {away_team_name}")
+                    continue
+                
                 # Actualizar scores y marcar como in_progress
-                update_result = supabase.table("matches").update({
+                pending_writes.append((match_id, {
                     "home_score": home_score,
                     "away_score": away_score,
                     "status": "in_progress",
-                    "updated_at": datetime.now(CDMX_TZ).isoformat()
-                }).eq("id", match_id).execute()
-                
-                if update_result.data:
-                    matches_updated += 1
-                    update_details.append({
-                        "match_id": match_id,
-                        "home_team": home_team_name,
-                        "away_team": away_team_name,
-                        "score": f"{home_score} - {away_score}",
-                        "status": "in_progress"
-                    })
-                    logger.info(f"   ✅ Actualizado IN PROGRESS: {home_team_name} {home_score} - {away_score} {away_team_name}")
+                    "updated_at": now_iso
+                }, {
+                    "match_id": match_id,
+                    "home_team": home_team_name,
+                    "away_team": away_team_name,
+                    "score": f"{home_score} - {away_score}",
+                    "status": "in_progress"
+                }))
                 
             except Exception as e:
                 logger.error(f"   ❌ Error procesando partido: {e}")
@@ -2106,27 +2459,44 @@ async def update_live_scores():
         
         # Marcar como completados los partidos que estaban in_progress pero ya no están en vivo
         for in_progress_match in in_progress_matches:
-            match_id = in_progress_match['id']
-            if match_id not in live_match_ids:
-                # Este partido ya no está en vivo, marcarlo como completado
-                try:
-                    complete_result = supabase.table("matches").update({
-                        "status": "completed",
-                        "updated_at": datetime.now(CDMX_TZ).isoformat()
-                    }).eq("id", match_id).execute()
-                    
-                    if complete_result.data:
-                        matches_completed += 1
-                        update_details.append({
-                            "match_id": match_id,
-                            "status": "completed",
-                            "note": "No longer in live API"
-                        })
-                        logger.info(f"   ✅ Partido {match_id} marcado como COMPLETED (ya no está en vivo)")
-                except Exception as e:
-                    logger.error(f"   ❌ Error marcando partido {match_id} como completed: {e}")
-        
-        logger.info(f"✅ ACTUALIZACIÓN COMPLETADA: {matches_updated} actualizados, {matches_completed} completados")
+            if in_progress_match['id'] not in live_match_ids:
+                completed_writes.append((in_progress_match['id'], {
+                    "match_id": in_progress_match['id'],
+                    "status": "completed",
+                    "note": "No longer in live API"
+                }))
+        
+        # Marcadores en vivo: solo las columnas del marcador, partido por partido
+        for match_id, live_values, detail in pending_writes:
+            try:
+                supabase.table("matches").update(live_values).eq("id", match_id).execute()
+            except Exception as e:
+                logger.error(f"   ❌ Error escribiendo partido {match_id}: {e}")
+                continue
+            update_details.append(detail)
+            matches_updated += 1
+            logger.info(f"   ✅ Actualizado IN PROGRESS: {detail['home_team']} {detail['score']} {detail['away_team']}")
+        
+        # Completados en un solo update; solo si siguen in_progress en la BD
+        if completed_writes:
+            try:
+                completed_result = supabase.table("matches").update({
+                    "status": "completed",
+                    "updated_at": now_iso
+                }).in_("id", [match_id for match_id, _ in completed_writes]).eq("status", "in_progress").execute()
+                # Solo se reportan las filas que el update regresó (las que seguían in_progress)
+                completed_ids = {row['id'] for row in completed_result.data or []}
+                for match_id, detail in completed_writes:
+                    if match_id not in completed_ids:
+                        logger.info(f"   ⏭️ Partido {match_id} ya no estaba in_progress en la BD; no se marca")
+                        continue
+                    update_details.append(detail)
+                    matches_completed += 1
+                    logger.info(f"   ✅ Partido {match_id} marcado como COMPLETED (ya no está en vivo)")
+            except Exception as e:
+                logger.error(f"   ❌ Error marcando partidos completados: {e}")
+        
+        logger.info(f"✅ ACTUALIZACIÓN COMPLETADA: {matches_updated} actualizados, {matches_skipped} sin cambios, {matches_completed} completados")
         
         return {
             "status": "success",
@@ -2134,8 +2504,13 @@ async def update_live_scores():
             "season_id": season_id,
             "week": current_week,
             "matches_updated": matches_updated,
+            "matches_written": matches_updated,
+            "matches_skipped": matches_skipped,
             "matches_completed": matches_completed,
             "live_matches_found": len(live_matches),
+            "upstream_degraded": nfl_client.is_degraded("/nfl-livescores"),
+            "stale": live_data.get('stale', False),
+            "age_seconds": live_data.get('age_seconds'),
             "details": update_details
         }
         
@@ -2154,11 +2529,10 @@ async def get_sunday_matches_schedule():
         logger.info("🔄 Obteniendo horarios de partidos del domingo")
         
         # Obtener temporada activa
-        season_query = supabase.table("seasons").select("*").eq("is_active", True).execute()
-        if not season_query.data:
+        current_season = active_season.get()
+        if not current_season:
             return {"error": "No hay temporada activa"}
         
-        current_season = season_query.data[0]
         season_id = current_season['id']
         current_week = current_season.get('current_week', 1)
         
@@ -2250,19 +2624,24 @@ async def get_sunday_matches_schedule():
 
 # --- ENDPOINT: COMPLETE SUNDAY MATCHES ---
 @app.post("/complete-sunday-matches")
-async def complete_sunday_matches():
+async def complete_sunday_matches(
+    min_hours_after_kickoff: float = Query(None, ge=0, description="Solo completar partidos cuyo kickoff fue hace al menos N horas")
+):
     """
-    Marca todos los partidos del domingo de la semana actual como 'completed'.
+    Marca todos los partidos del domingo de la semana actual como 'completed'
+    con un solo update y regresa las filas afectadas.
+    Con min_hours_after_kickoff solo se completan los partidos cuyo kickoff + N horas
+    ya pasó. 'timing_ms' reporta el costo de la consulta, del update y el total.
     """
     try:
+        started = time.perf_counter()
         logger.info("🔄 INICIANDO: Marcar partidos del domingo como completados")
         
         # Obtener temporada activa
-        season_query = supabase.table("seasons").select("*").eq("is_active", True).execute()
-        if not season_query.data:
+        current_season = active_season.get()
+        if not current_season:
             raise HTTPException(status_code=404, detail="No hay temporada activa")
         
-        current_season = season_query.data[0]
         season_id = current_season['id']
         current_week = current_season.get('current_week', 1)
         
@@ -2275,9 +2654,12 @@ async def complete_sunday_matches():
             return {"message": f"No hay partidos para la semana {current_week}", "matches_completed": 0}
         
         all_matches = matches_query.data
+        query_ms = (time.perf_counter() - started) * 1000
+        now_cdmx = datetime.now(CDMX_TZ)
         
         # Filtrar solo partidos del domingo
         sunday_match_ids = []
+        not_finished_ids = []  # Domingo, pero kickoff + N horas aún no pasa
         for match in all_matches:
             try:
                 game_date_str = match['game_date']
@@ -2296,34 +2678,40 @@ async def complete_sunday_matches():
                     game_dt = game_dt.astimezone(CDMX_TZ)
                 
                 # Verificar si es domingo (weekday() == 6)
-                if game_dt.weekday() == 6:
-                    sunday_match_ids.append(match['id'])
+                if game_dt.weekday() != 6:
+                    continue
+                if min_hours_after_kickoff is not None and now_cdmx < game_dt + timedelta(hours=min_hours_after_kickoff):
+                    not_finished_ids.append(match['id'])
+                    continue
+                sunday_match_ids.append(match['id'])
             except Exception as e:
                 logger.error(f"Error procesando partido {match['id']}: {e}")
                 continue
         
         if not sunday_match_ids:
-            return {"message": "No hay partidos del domingo para marcar como completados", "matches_completed": 0}
+            return {
+                "message": "No hay partidos del domingo para marcar como completados",
+                "matches_completed": 0,
+                "skipped_not_finished": not_finished_ids
+            }
         
         logger.info(f"📊 Partidos del domingo a completar: {len(sunday_match_ids)}")
         
-        # Actualizar todos los partidos del domingo a 'completed'
-        matches_completed = 0
-        for match_id in sunday_match_ids:
-            try:
-                update_result = supabase.table("matches").update({
-                    "status": "completed",
-                    "updated_at": datetime.now(CDMX_TZ).isoformat()
-                }).eq("id", match_id).execute()
-                
-                if update_result.data:
-                    matches_completed += 1
-                    logger.info(f"   ✅ Partido {match_id} marcado como completado")
-            except Exception as e:
-                logger.error(f"   ❌ Error actualizando partido {match_id}: {e}")
-                continue
+        # Actualizar todos los partidos del domingo a 'completed' en un solo update
+        update_started = time.perf_counter()
+        update_result = supabase.table("matches").update({
+            "status": "completed",
+            "updated_at": utc_timestamp()
+        }).in_("id", sunday_match_ids).execute()
+        update_ms = (time.perf_counter() - update_started) * 1000
         
-        logger.info(f"✅ COMPLETADO: {matches_completed} partidos marcados como completados")
+        completed_rows = [
+            {"id": row['id'], "status": row.get('status'), "game_date": row.get('game_date')}
+            for row in update_result.data or []
+        ]
+        matches_completed = len(completed_rows)
+        
+        logger.info(f"✅ COMPLETADO: {matches_completed} partidos marcados como completados en {update_ms:.0f} ms")
         
         return {
             "status": "success",
@@ -2331,7 +2719,14 @@ async def complete_sunday_matches():
             "season_id": season_id,
             "week": current_week,
             "matches_completed": matches_completed,
-            "total_sunday_matches": len(sunday_match_ids)
+            "total_sunday_matches": len(sunday_match_ids) + len(not_finished_ids),
+            "completed_matches": completed_rows,
+            "skipped_not_finished": not_finished_ids,
+            "timing_ms": {
+                "query": round(query_ms, 1),
+                "update": round(update_ms, 1),
+                "total": round((time.perf_counter() - started) * 1000, 1)
+            }
         }
         
     except Exception as e:
@@ -0,0 +1,75 @@
+"""
+Benchmark de memoria: parseo completo vs. streaming del payload de /nfl-events.
+
+Uso:
+    python scripts/benchmark_events_parse.py                 # payload sintético (288 partidos)
+    python scripts/benchmark_events_parse.py eventos.json    # payload capturado de la API
+
+El camino "actual" replica update_matches: response.json() + lista de temporada
+regular + lista filtrada por fecha. El camino "streaming" usa parse_events_stream
+con chunks de 64 KB, como lo hace NFLClient.events_compact. Que ambos caminos
+dejen los mismos campos se prueba en tests/test_events_parse.py.
+"""
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+from _nfl_events import parse_events_stream
+from rapidapi_standin import synthetic_events_payload
+
+CHUNK_SIZE = 64 * 1024
+
+
+def current_path(raw):
+    data = json.loads(raw)
+    events = data.get('events', [])
+    regular_events = [e for e in events if e.get('season', {}).get('type') == 2]
+    filtered_events = [e for e in regular_events if e.get('date')]
+    return data, regular_events, filtered_events
+
+
+def streaming_path(raw):
+    chunks = (raw[i:i + CHUNK_SIZE] for i in range(0, len(raw), CHUNK_SIZE))
+    data = parse_events_stream(chunks)
+    events = data['events']
+    regular_events = [e for e in events if e.get('season', {}).get('type') == 2]
+    filtered_events = [e for e in regular_events if e.get('date')]
+    return data, regular_events, filtered_events
+
+
+def measure(fn, raw):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn(raw)
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak, elapsed
+
+
+def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'rb') as f:
+            raw = f.read()
+        source = sys.argv[1]
+    else:
+        raw = json.dumps(synthetic_events_payload(2025)).encode('utf-8')
+        source = "sintético"
+
+    mb = 1024 * 1024
+    print(f"Payload ({source}): {len(raw) / mb:.2f} MB")
+    (full, _, _), full_retained, full_peak, full_time = measure(current_path, raw)
+    (compact, _, _), compact_retained, compact_peak, compact_time = measure(streaming_path, raw)
+
+    print(f"{'camino':<12}{'pico MB':>10}{'retenido MB':>14}{'tiempo s':>10}")
+    print(f"{'actual':<12}{full_peak / mb:>10.2f}{full_retained / mb:>14.2f}{full_time:>10.3f}")
+    print(f"{'streaming':<12}{compact_peak / mb:>10.2f}{compact_retained / mb:>14.2f}{compact_time:>10.3f}")
+
+    # La equivalencia de campos entre ambos caminos la cubre tests/test_events_parse.py
+    print(f"{len(full['events'])} eventos (actual), {len(compact['events'])} eventos (streaming)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Servidor local que reemplaza a nfl-api-data.p.rapidapi.com para benchmarks offline.
+
+Sirve /nfl-events, /nfl-eventodds, /nfl-team-listing/v1/data, /nfl-team-record
+y /nfl-livescores desde respuestas capturadas (fixtures) o, si no hay captura,
+desde payloads sintéticos con los 32 equipos reales. Permite simular latencia,
+jitter, respuestas 429 y payloads más grandes.
+
+Uso:
+    # Replay (offline)
+    python scripts/rapidapi_standin.py --port 8787 --latency-ms 150 --jitter-ms 50 --rate-429 0.05 --scale 2
+
+    # Capturar respuestas reales en el directorio de fixtures
+    RAPIDAPI_KEY=... python scripts/rapidapi_standin.py --record
+
+    # Apuntar la API al stand-in
+    cd api && BASE_URL=http://127.0.0.1:8787 uvicorn index:app --reload
+
+La configuración se puede cambiar en caliente con POST /_standin/config y los
+contadores se consultan en GET /_standin/stats.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import zlib
+from datetime import datetime, timedelta
+
+import requests
+import uvicorn
+from fastapi import FastAPI, Request, Body
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
+
+UPSTREAM_URL = "https://nfl-api-data.p.rapidapi.com"
+UPSTREAM_HOST = "nfl-api-data.p.rapidapi.com"
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rapidapi_fixtures")
+
+# (id ESPN, abreviación, ciudad, nombre)
+NFL_TEAMS = [
+    ("22", "ARI", "Arizona", "Cardinals"), ("1", "ATL", "Atlanta", "Falcons"),
+    ("33", "BAL", "Baltimore", "Ravens"), ("2", "BUF", "Buffalo", "Bills"),
+    ("29", "CAR", "Carolina", "Panthers"), ("3", "CHI", "Chicago", "Bears"),
+    ("4", "CIN", "Cincinnati", "Bengals"), ("5", "CLE", "Cleveland", "Browns"),
+    ("6", "DAL", "Dallas", "Cowboys"), ("7", "DEN", "Denver", "Broncos"),
+    ("8", "DET", "Detroit", "Lions"), ("9", "GB", "Green Bay", "Packers"),
+    ("34", "HOU", "Houston", "Texans"), ("11", "IND", "Indianapolis", "Colts"),
+    ("30", "JAX", "Jacksonville", "Jaguars"), ("12", "KC", "Kansas City", "Chiefs"),
+    ("13", "LV", "Las Vegas", "Raiders"), ("24", "LAC", "Los Angeles", "Chargers"),
+    ("14", "LAR", "Los Angeles", "Rams"), ("15", "MIA", "Miami", "Dolphins"),
+    ("16", "MIN", "Minnesota", "Vikings"), ("17", "NE", "New England", "Patriots"),
+    ("18", "NO", "New Orleans", "Saints"), ("19", "NYG", "New York", "Giants"),
+    ("20", "NYJ", "New York", "Jets"), ("21", "PHI", "Philadelphia", "Eagles"),
+    ("23", "PIT", "Pittsburgh", "Steelers"), ("25", "SF", "San Francisco", "49ers"),
+    ("26", "SEA", "Seattle", "Seahawks"), ("27", "TB", "Tampa Bay", "Buccaneers"),
+    ("10", "TEN", "Tennessee", "Titans"), ("28", "WSH", "Washington", "Commanders"),
+]
+
+ENDPOINTS = [
+    "/nfl-events",
+    "/nfl-eventodds",
+    "/nfl-team-listing/v1/data",
+    "/nfl-team-record",
+    "/nfl-livescores",
+]
+
+
+def _team(team):
+    team_id, abbr, location, name = team
+    return {
+        'id': team_id, 'abbreviation': abbr, 'location': location, 'name': name,
+        'displayName': f"{location} {name}", 'shortDisplayName': name
+    }
+
+
+def week_pairings(week):
+    """16 partidos (home, away) de una semana; rotación simple para variar emparejamientos."""
+    order = NFL_TEAMS[week % 32:] + NFL_TEAMS[:week % 32]
+    return [(order[game], order[31 - game]) for game in range(16)]
+
+
+def synthetic_events_payload(year, filler_kb=12, now=None):
+    """Temporada regular de 18 semanas (16 partidos por semana) con relleno similar al real."""
+    filler = "x" * 1024
+    now = now or datetime.utcnow()
+    start = datetime(year, 9, 4, 0, 20)
+    events = []
+    for week in range(1, 19):
+        for game, (home, away) in enumerate(week_pairings(week)):
+            kickoff = start + timedelta(days=7 * (week - 1), hours=game % 8)
+            completed = kickoff + timedelta(hours=4) < now
+            event_id = f"4017{year % 100:02d}{week:02d}{game:02d}"
+            competitors = []
+            for side, team in (('home', home), ('away', away)):
+                competitors.append({
+                    'id': team[0],
+                    'homeAway': side,
+                    'score': str((int(event_id) + int(team[0])) % 38) if completed else "0",
+                    'team': dict(_team(team), logos=[{'href': f"https://example.com/{team[1]}-{n}.png"} for n in range(4)]),
+                    'leaders': [{'name': f"leader{n}", 'notes': filler} for n in range(filler_kb // 4)]
+                })
+            events.append({
+                'id': event_id,
+                'date': kickoff.strftime("%Y-%m-%dT%H:%MZ"),
+                'name': f"{away[2]} {away[3]} at {home[2]} {home[3]}",
+                'season': {'year': year, 'type': 2, 'slug': 'regular-season'},
+                'week': {'number': week},
+                'links': [{'href': f"https://example.com/game/{event_id}/{n}", 'text': filler[:300]} for n in range(8)],
+                'competitions': [{
+                    'id': event_id,
+                    'competitors': competitors,
+                    'status': {'type': {
+                        'completed': completed,
+                        'state': 'post' if completed else 'pre',
+                        'name': 'STATUS_FINAL' if completed else 'STATUS_SCHEDULED'
+                    }},
+                    'notes': [filler for _ in range(filler_kb // 4)]
+                }]
+            })
+    return {'leagues': [{'id': '28', 'name': 'National Football League'}], 'events': events}
+
+
+def synthetic_payload(endpoint, params):
+    # Semilla estable por (endpoint, params) para que el replay sea reproducible
+    rng = random.Random(zlib.crc32(f"{endpoint}?{sorted(params.items())}".encode()))
+    if endpoint == "/nfl-events":
+        return synthetic_events_payload(int(params.get('year', datetime.utcnow().year)))
+    if endpoint == "/nfl-team-listing/v1/data":
+        return [{'team': _team(team)} for team in NFL_TEAMS]
+    if endpoint == "/nfl-team-record":
+        wins, losses = rng.randint(0, 12), rng.randint(0, 12)
+        return {'items': [{
+            'id': '0', 'name': 'overall',
+            'stats': [{'name': 'wins', 'value': wins}, {'name': 'losses', 'value': losses}, {'name': 'ties', 'value': 0}]
+        }]}
+    if endpoint == "/nfl-eventodds":
+        spread = rng.choice([-7.5, -3.5, -3.0, -1.5, 1.5, 3.0, 6.5])
+        return {'items': [{
+            'provider': {'name': 'ESPN BET'},
+            'spread': spread,
+            'overUnder': rng.choice([41.5, 44.5, 47.5]),
+            'overOdds': -110, 'underOdds': -110,
+            'homeTeamOdds': {'moneyLine': -150 if spread < 0 else 130, 'spreadOdds': -110, 'favorite': spread < 0},
+            'awayTeamOdds': {'moneyLine': 130 if spread < 0 else -150, 'spreadOdds': -110, 'favorite': spread >= 0}
+        }]}
+    if endpoint == "/nfl-livescores":
+        # Partidos de la semana 1 (la que se puede preparar en la BD para pruebas)
+        live = []
+        for home, away in rng.sample(week_pairings(1), 6):
+            live.append({
+                'homeCompetitor': {'shortName': home[3], 'score': rng.randint(0, 35)},
+                'awayCompetitor': {'shortName': away[3], 'score': rng.randint(0, 35)}
+            })
+        return {'live': live}
+    return None
+
+
+def scale_payload(endpoint, payload, scale):
+    """Multiplica los eventos de /nfl-events (con ids distintos) para simular payloads más grandes."""
+    if endpoint != "/nfl-events" or scale <= 1 or not isinstance(payload, dict):
+        return payload
+    events = payload.get('events', [])
+    scaled = []
+    for copy in range(int(scale)):
+        for event in events:
+            scaled.append(event if copy == 0 else dict(event, id=f"{event.get('id')}-{copy}"))
+    return dict(payload, events=scaled)
+
+
+def fixture_path(fixtures_dir, endpoint, params):
+    name = endpoint.strip('/').replace('/', '_')
+    if params:
+        name += "__" + "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+    return os.path.join(fixtures_dir, f"{name}.json")
+
+
+def create_app(fixtures_dir=DEFAULT_FIXTURES_DIR, latency_ms=0, jitter_ms=0, rate_429=0.0,
+               scale=1, record=False, monthly_quota=100000):
+    app = FastAPI(title="RapidAPI stand-in")
+    app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+    config = {
+        "latency_ms": latency_ms,
+        "jitter_ms": jitter_ms,
+        "rate_429": rate_429,
+        "scale": scale,
+        "record": record,
+        "monthly_quota": monthly_quota
+    }
+    stats = {"requests": 0, "injected_429": 0, "fixtures": 0, "synthetic": 0, "recorded": 0, "by_endpoint": {}}
+
+    def load(endpoint, params):
+        path = fixture_path(fixtures_dir, endpoint, params)
+        generic = fixture_path(fixtures_dir, endpoint, {})
+        for candidate in (path, generic):
+            if os.path.exists(candidate):
+                with open(candidate, 'r', encoding='utf-8') as f:
+                    stats["fixtures"] += 1
+                    return json.load(f)
+
+        if config["record"]:
+            response = requests.get(f"{UPSTREAM_URL}{endpoint}", params=params, timeout=30, headers={
+                'X-RapidAPI-Key': os.getenv("RAPIDAPI_KEY", ""),
+                'X-RapidAPI-Host': UPSTREAM_HOST
+            })
+            response.raise_for_status()
+            payload = response.json()
+            os.makedirs(fixtures_dir, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f)
+            stats["recorded"] += 1
+            return payload
+
+        stats["synthetic"] += 1
+        return synthetic_payload(endpoint, params)
+
+    async def serve(endpoint, request):
+        stats["requests"] += 1
+        stats["by_endpoint"][endpoint] = stats["by_endpoint"].get(endpoint, 0) + 1
+        remaining = max(0, config["monthly_quota"] - stats["requests"])
+        headers = {
+            'X-RateLimit-Requests-Limit': str(config["monthly_quota"]),
+            'X-RateLimit-Requests-Remaining': str(remaining)
+        }
+
+        delay = config["latency_ms"] + random.uniform(-config["jitter_ms"], config["jitter_ms"])
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+        if config["rate_429"] and random.random() < config["rate_429"]:
+            stats["injected_429"] += 1
+            return JSONResponse({"message": "Too many requests"}, status_code=429,
+                                headers=dict(headers, **{'Retry-After': '1'}))
+
+        params = dict(request.query_params)
+        payload = await asyncio.to_thread(load, endpoint, params)
+        if payload is None:
+            return JSONResponse({"message": "Not found"}, status_code=404, headers=headers)
+        return JSONResponse(scale_payload(endpoint, payload, config["scale"]), headers=headers)
+
+    for endpoint in ENDPOINTS:
+        async def handler(request: Request, _endpoint=endpoint):
+            return await serve(_endpoint, request)
+        app.add_api_route(endpoint, handler, methods=["GET"])
+
+    @app.get("/_standin/stats")
+    async def standin_stats():
+        return {"config": config, "stats": stats}
+
+    @app.post("/_standin/config")
+    async def standin_config(changes: dict = Body(...)):
+        for key, value in changes.items():
+            if key in config:
+                config[key] = value
+        return {"config": config}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in local de NFL API Data (RapidAPI)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--fixtures", default=os.getenv("STANDIN_FIXTURES_DIR", DEFAULT_FIXTURES_DIR))
+    parser.add_argument("--latency-ms", type=float, default=0, help="Latencia base por request")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Variación aleatoria +/- sobre la latencia")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Probabilidad (0-1) de responder 429")
+    parser.add_argument("--scale", type=int, default=1, help="Multiplicador de eventos en /nfl-events")
+    parser.add_argument("--record", action="store_true", help="Consultar RapidAPI real y guardar fixtures faltantes")
+    args = parser.parse_args()
+
+    app = create_app(
+        fixtures_dir=args.fixtures,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_429=args.rate_429,
+        scale=args.scale,
+        record=args.record
+    )
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
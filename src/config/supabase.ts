@@ -50,6 +50,7 @@ export type Database = {
           is_active: boolean;
           start_date: string | null;
           end_date: string | null;
+          picks_scored_through: string | null;
           created_at: string;
         };
         Insert: {
@@ -149,6 +150,8 @@ export type Database = {
           total_losses: number;
           longest_streak: number;
           current_streak: number;
+          win_run: number | null;
+          last_scored_week: number | null;
           created_at: string;
           updated_at: string;
         };
@@ -0,0 +1,16 @@
+-- Un solo récord por equipo y año: permite que /save-weekly-team-records
+-- escriba todos los equipos con upsert(..., on_conflict="team_id,year").
+
+-- Eliminar duplicados previos, conservando la fila más reciente por updated_at
+-- (el id más alto desempata y cubre filas sin updated_at)
+DELETE FROM public.team_records t
+USING (
+  SELECT id,
+         row_number() OVER (PARTITION BY team_id, year ORDER BY updated_at DESC NULLS LAST, id DESC) AS rn
+  FROM public.team_records
+) ranked
+WHERE t.id = ranked.id
+  AND ranked.rn > 1;
+
+ALTER TABLE public.team_records
+  ADD CONSTRAINT team_records_team_id_year_key UNIQUE (team_id, year);
@@ -0,0 +1,16 @@
+-- Una fila de odds por partido y semana: permite que /update-weekly-odds
+-- escriba la semana completa con upsert(..., on_conflict="match_id,week_number").
+
+-- Eliminar duplicados previos, conservando la fila más reciente por last_updated
+-- (el id más alto desempata y cubre filas sin last_updated)
+DELETE FROM public.weekly_odds o
+USING (
+  SELECT id,
+         row_number() OVER (PARTITION BY match_id, week_number ORDER BY last_updated DESC NULLS LAST, id DESC) AS rn
+  FROM public.weekly_odds
+) ranked
+WHERE o.id = ranked.id
+  AND ranked.rn > 1;
+
+ALTER TABLE public.weekly_odds
+  ADD CONSTRAINT weekly_odds_match_id_week_number_key UNIQUE (match_id, week_number);
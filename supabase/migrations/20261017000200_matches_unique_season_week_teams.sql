@@ -0,0 +1,10 @@
+-- Un partido por temporada, semana y par local/visitante: permite que
+-- /update-matches sincronice la temporada con un solo
+-- upsert(..., on_conflict="season_id,week,home_team_id,away_team_id").
+-- Si la consulta de abajo regresa filas, hay partidos duplicados que deben
+-- resolverse a mano (pueden tener picks asociados) antes de aplicar el constraint:
+--   SELECT season_id, week, home_team_id, away_team_id, count(*)
+--   FROM public.matches GROUP BY 1, 2, 3, 4 HAVING count(*) > 1;
+
+ALTER TABLE public.matches
+  ADD CONSTRAINT matches_season_week_teams_key UNIQUE (season_id, week, home_team_id, away_team_id);
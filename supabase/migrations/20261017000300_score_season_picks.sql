@@ -0,0 +1,180 @@
+-- Calificación de picks y estadísticas de entradas en una sola llamada.
+-- /auto-update-picks la invoca con supabase.rpc("score_season_picks", ...);
+-- las reglas son las mismas que compute_pick_result y compute_entry_stats en
+-- api/index.py, que se mantienen como respaldo y para verificar (cross_check).
+--
+-- Picks (temporada p_season_id, semanas <= p_week):
+--   * partido no completado o sin marcador -> 'pending', 0 puntos
+--   * W: multiplicador, T: multiplicador / 2 (entero), L: -300
+--   * multiplicador = horas entre el pick y el partido:
+--       <= 0 -> 0, (0, 1) -> 1, >= 1 -> floor(horas)
+-- Entradas: alive -> last_chance (1 derrota) -> eliminated (2 derrotas);
+--   los picks posteriores a la eliminación no cuentan. Solo se escriben las
+--   filas cuyo valor cambia.
+
+CREATE OR REPLACE FUNCTION public.score_season_picks(p_season_id integer, p_week integer)
+RETURNS json
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_picks_updated integer;
+  v_entries_updated integer;
+BEGIN
+  WITH scored AS (
+    SELECT
+      p.id,
+      CASE
+        WHEN m.status IS DISTINCT FROM 'completed'
+          OR m.home_score IS NULL OR m.away_score IS NULL THEN 'pending'
+        WHEN m.home_score = m.away_score THEN 'T'
+        WHEN p.selected_team_id = CASE WHEN m.home_score > m.away_score
+                                       THEN m.home_team_id ELSE m.away_team_id END THEN 'W'
+        ELSE 'L'
+      END AS result,
+      CASE
+        WHEN m.game_date IS NULL OR p.created_at IS NULL THEN 0
+        ELSE extract(epoch FROM (m.game_date::timestamp - p.created_at::timestamp)) / 3600.0
+      END AS hours_diff
+    FROM picks p
+    JOIN matches m ON m.id = p.match_id
+    WHERE p.season_id = p_season_id
+      AND p.week <= p_week
+  ),
+  computed AS (
+    SELECT
+      id,
+      result,
+      CASE result
+        WHEN 'pending' THEN 0
+        WHEN 'L' THEN -300
+        WHEN 'W' THEN multiplier
+        ELSE multiplier / 2
+      END AS points_earned
+    FROM (
+      SELECT
+        id,
+        result,
+        CASE
+          WHEN hours_diff <= 0 THEN 0
+          WHEN hours_diff < 1 THEN 1
+          ELSE floor(hours_diff)::integer
+        END AS multiplier
+      FROM scored
+    ) s
+  )
+  UPDATE picks p
+  SET result = c.result,
+      points_earned = c.points_earned
+  FROM computed c
+  WHERE p.id = c.id
+    AND (
+      -- Un pick pendiente solo se reescribe si tenía otro resultado
+      (c.result = 'pending' AND p.result IS DISTINCT FROM 'pending')
+      OR (c.result <> 'pending'
+          AND (p.result IS DISTINCT FROM c.result OR p.points_earned IS DISTINCT FROM c.points_earned))
+    );
+  GET DIAGNOSTICS v_picks_updated = ROW_COUNT;
+
+  WITH ordered AS (
+    SELECT
+      p.id,
+      p.entry_id,
+      p.week,
+      p.result,
+      row_number() OVER w AS rn,
+      count(*) FILTER (WHERE p.result IN ('L', 'loss')) OVER w AS losses_so_far
+    FROM picks p
+    WHERE p.season_id = p_season_id
+    WINDOW w AS (PARTITION BY p.entry_id ORDER BY p.week, p.id)
+  ),
+  cutoff AS (
+    -- Pick con la segunda derrota (eliminación)
+    SELECT entry_id, min(rn) FILTER (WHERE losses_so_far >= 2) AS elim_rn
+    FROM ordered
+    GROUP BY entry_id
+  ),
+  counted AS (
+    SELECT o.*, c.elim_rn
+    FROM ordered o
+    JOIN cutoff c USING (entry_id)
+    WHERE c.elim_rn IS NULL OR o.rn <= c.elim_rn
+  ),
+  totals AS (
+    SELECT
+      entry_id,
+      count(*) FILTER (WHERE result IN ('W', 'win'))::integer AS total_wins,
+      count(*) FILTER (WHERE result IN ('L', 'loss'))::integer AS total_losses,
+      max(week) FILTER (WHERE rn = elim_rn) AS eliminated_week
+    FROM counted
+    GROUP BY entry_id
+  ),
+  longest AS (
+    -- Solo una derrota corta la racha: victorias por tramo entre derrotas
+    SELECT entry_id, max(wins_in_segment)::integer AS longest_streak
+    FROM (
+      SELECT entry_id, losses_so_far, count(*) FILTER (WHERE result IN ('W', 'win')) AS wins_in_segment
+      FROM counted
+      GROUP BY entry_id, losses_so_far
+    ) segments
+    GROUP BY entry_id
+  ),
+  current_streaks AS (
+    -- Victorias desde el final hasta la última derrota o empate (pending no cuenta)
+    SELECT
+      o.entry_id,
+      count(*) FILTER (WHERE o.result IN ('W', 'win') AND o.rn > coalesce(b.last_break_rn, 0))::integer AS current_streak
+    FROM ordered o
+    LEFT JOIN (
+      SELECT entry_id, max(rn) AS last_break_rn
+      FROM ordered
+      WHERE result IN ('L', 'loss', 'T', 'draw')
+      GROUP BY entry_id
+    ) b USING (entry_id)
+    GROUP BY o.entry_id
+  ),
+  stats AS (
+    SELECT
+      e.id,
+      coalesce(t.total_wins, 0) AS total_wins,
+      coalesce(t.total_losses, 0) AS total_losses,
+      coalesce(l.longest_streak, 0) AS longest_streak,
+      coalesce(cs.current_streak, 0) AS current_streak,
+      CASE coalesce(t.total_losses, 0)
+        WHEN 0 THEN 'alive'
+        WHEN 1 THEN 'last_chance'
+        ELSE 'eliminated'
+      END AS status,
+      t.eliminated_week
+    FROM entries e
+    LEFT JOIN totals t ON t.entry_id = e.id
+    LEFT JOIN longest l ON l.entry_id = e.id
+    LEFT JOIN current_streaks cs ON cs.entry_id = e.id
+    WHERE e.season_id = p_season_id
+  )
+  UPDATE entries e
+  SET total_wins = s.total_wins,
+      total_losses = s.total_losses,
+      longest_streak = s.longest_streak,
+      current_streak = s.current_streak,
+      status = s.status,
+      eliminated_week = s.eliminated_week,
+      is_active = s.status <> 'eliminated'
+  FROM stats s
+  WHERE e.id = s.id
+    AND (e.total_wins, e.total_losses, e.longest_streak, e.current_streak, e.status, e.eliminated_week, e.is_active)
+        IS DISTINCT FROM
+        (s.total_wins, s.total_losses, s.longest_streak, s.current_streak, s.status, s.eliminated_week, s.status <> 'eliminated');
+  GET DIAGNOSTICS v_entries_updated = ROW_COUNT;
+
+  RETURN json_build_object(
+    'picks_updated', v_picks_updated,
+    'entries_updated', v_entries_updated
+  );
+END;
+$$;
+
+-- SECURITY DEFINER se salta RLS: solo el backend (service_role) la puede llamar
+REVOKE EXECUTE ON FUNCTION public.score_season_picks(integer, integer) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.score_season_picks(integer, integer) TO service_role;
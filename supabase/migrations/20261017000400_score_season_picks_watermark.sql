@@ -0,0 +1,239 @@
+-- Calificación incremental: seasons.picks_scored_through guarda el mayor
+-- matches.updated_at ya calificado. La función la lee de seasons y solo
+-- recalcula los picks cuyo partido cambió después de esa marca, más los picks
+-- aún pendientes (cubre picks insertados para partidos que ya se habían
+-- calificado). Los partidos justo en la marca se vuelven a revisar (>=); no se
+-- escribe nada si no cambiaron. Con p_full se recalcula toda la temporada.
+-- La nueva marca (nunca posterior a now() menos un margen de seguridad) se
+-- guarda en la misma transacción. updated_at lo mantiene un trigger cada vez
+-- que cambian el marcador, el status o la fecha, sin importar quién escribe
+-- (backend, frontend o ediciones manuales en el dashboard).
+
+ALTER TABLE public.seasons
+  ADD COLUMN IF NOT EXISTS picks_scored_through timestamptz;
+
+CREATE INDEX IF NOT EXISTS matches_season_updated_at_idx
+  ON public.matches (season_id, updated_at);
+
+CREATE OR REPLACE FUNCTION public.set_matches_updated_at()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF (NEW.home_score, NEW.away_score, NEW.status, NEW.game_date)
+     IS DISTINCT FROM (OLD.home_score, OLD.away_score, OLD.status, OLD.game_date) THEN
+    NEW.updated_at := now();
+  END IF;
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS matches_set_updated_at ON public.matches;
+CREATE TRIGGER matches_set_updated_at
+  BEFORE UPDATE OF home_score, away_score, status, game_date ON public.matches
+  FOR EACH ROW
+  EXECUTE FUNCTION public.set_matches_updated_at();
+
+DROP FUNCTION IF EXISTS public.score_season_picks(integer, integer);
+
+CREATE OR REPLACE FUNCTION public.score_season_picks(p_season_id integer, p_week integer, p_full boolean DEFAULT false)
+RETURNS json
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_picks_updated integer;
+  v_entries_updated integer;
+  v_since timestamptz;
+  v_scored_through timestamptz;
+  -- La marca queda este margen detrás de now(): updated_at se fija antes del commit
+  v_safety_lag constant interval := interval '5 minutes';
+BEGIN
+  -- La marca se lee aquí, nunca del llamador
+  IF NOT p_full THEN
+    SELECT s.picks_scored_through INTO v_since FROM seasons s WHERE s.id = p_season_id;
+  END IF;
+
+  -- Nueva marca: el partido más reciente que entra en esta corrida, pero nunca
+  -- más allá de now() - v_safety_lag. Un partido escrito en una transacción que
+  -- aún no hace commit (o con updated_at en el futuro) se vuelve a leer en la
+  -- siguiente corrida en vez de quedar detrás de la marca.
+  SELECT max(m.updated_at)::timestamptz
+  INTO v_scored_through
+  FROM matches m
+  WHERE m.season_id = p_season_id
+    AND m.week <= p_week
+    AND (v_since IS NULL OR m.updated_at >= v_since);
+  IF v_scored_through > now() - v_safety_lag THEN
+    v_scored_through := now() - v_safety_lag;
+  END IF;
+  -- La marca nunca retrocede
+  v_scored_through := greatest(v_scored_through, v_since);
+
+  WITH scored AS (
+    SELECT
+      p.id,
+      CASE
+        WHEN m.status IS DISTINCT FROM 'completed'
+          OR m.home_score IS NULL OR m.away_score IS NULL THEN 'pending'
+        WHEN m.home_score = m.away_score THEN 'T'
+        WHEN p.selected_team_id = CASE WHEN m.home_score > m.away_score
+                                       THEN m.home_team_id ELSE m.away_team_id END THEN 'W'
+        ELSE 'L'
+      END AS result,
+      CASE
+        WHEN m.game_date IS NULL OR p.created_at IS NULL THEN 0
+        ELSE extract(epoch FROM (m.game_date::timestamp - p.created_at::timestamp)) / 3600.0
+      END AS hours_diff
+    FROM picks p
+    JOIN matches m ON m.id = p.match_id
+    WHERE p.season_id = p_season_id
+      AND p.week <= p_week
+      AND (v_since IS NULL
+           OR m.updated_at >= v_since
+           OR p.result IS NULL
+           OR p.result = 'pending')
+  ),
+  computed AS (
+    SELECT
+      id,
+      result,
+      CASE result
+        WHEN 'pending' THEN 0
+        WHEN 'L' THEN -300
+        WHEN 'W' THEN multiplier
+        ELSE multiplier / 2
+      END AS points_earned
+    FROM (
+      SELECT
+        id,
+        result,
+        CASE
+          WHEN hours_diff <= 0 THEN 0
+          WHEN hours_diff < 1 THEN 1
+          ELSE floor(hours_diff)::integer
+        END AS multiplier
+      FROM scored
+    ) s
+  )
+  UPDATE picks p
+  SET result = c.result,
+      points_earned = c.points_earned
+  FROM computed c
+  WHERE p.id = c.id
+    AND (
+      -- Un pick pendiente solo se reescribe si tenía otro resultado
+      (c.result = 'pending' AND p.result IS DISTINCT FROM 'pending')
+      OR (c.result <> 'pending'
+          AND (p.result IS DISTINCT FROM c.result OR p.points_earned IS DISTINCT FROM c.points_earned))
+    );
+  GET DIAGNOSTICS v_picks_updated = ROW_COUNT;
+
+  WITH ordered AS (
+    SELECT
+      p.id,
+      p.entry_id,
+      p.week,
+      p.result,
+      row_number() OVER w AS rn,
+      count(*) FILTER (WHERE p.result IN ('L', 'loss')) OVER w AS losses_so_far
+    FROM picks p
+    WHERE p.season_id = p_season_id
+    WINDOW w AS (PARTITION BY p.entry_id ORDER BY p.week, p.id)
+  ),
+  cutoff AS (
+    -- Pick con la segunda derrota (eliminación)
+    SELECT entry_id, min(rn) FILTER (WHERE losses_so_far >= 2) AS elim_rn
+    FROM ordered
+    GROUP BY entry_id
+  ),
+  counted AS (
+    SELECT o.*, c.elim_rn
+    FROM ordered o
+    JOIN cutoff c USING (entry_id)
+    WHERE c.elim_rn IS NULL OR o.rn <= c.elim_rn
+  ),
+  totals AS (
+    SELECT
+      entry_id,
+      count(*) FILTER (WHERE result IN ('W', 'win'))::integer AS total_wins,
+      count(*) FILTER (WHERE result IN ('L', 'loss'))::integer AS total_losses,
+      max(week) FILTER (WHERE rn = elim_rn) AS eliminated_week
+    FROM counted
+    GROUP BY entry_id
+  ),
+  longest AS (
+    -- Solo una derrota corta la racha: victorias por tramo entre derrotas
+    SELECT entry_id, max(wins_in_segment)::integer AS longest_streak
+    FROM (
+      SELECT entry_id, losses_so_far, count(*) FILTER (WHERE result IN ('W', 'win')) AS wins_in_segment
+      FROM counted
+      GROUP BY entry_id, losses_so_far
+    ) segments
+    GROUP BY entry_id
+  ),
+  current_streaks AS (
+    -- Victorias desde el final hasta la última derrota o empate (pending no cuenta)
+    SELECT
+      o.entry_id,
+      count(*) FILTER (WHERE o.result IN ('W', 'win') AND o.rn > coalesce(b.last_break_rn, 0))::integer AS current_streak
+    FROM ordered o
+    LEFT JOIN (
+      SELECT entry_id, max(rn) AS last_break_rn
+      FROM ordered
+      WHERE result IN ('L', 'loss', 'T', 'draw')
+      GROUP BY entry_id
+    ) b USING (entry_id)
+    GROUP BY o.entry_id
+  ),
+  stats AS (
+    SELECT
+      e.id,
+      coalesce(t.total_wins, 0) AS total_wins,
+      coalesce(t.total_losses, 0) AS total_losses,
+      coalesce(l.longest_streak, 0) AS longest_streak,
+      coalesce(cs.current_streak, 0) AS current_streak,
+      CASE coalesce(t.total_losses, 0)
+        WHEN 0 THEN 'alive'
+        WHEN 1 THEN 'last_chance'
+        ELSE 'eliminated'
+      END AS status,
+      t.eliminated_week
+    FROM entries e
+    LEFT JOIN totals t ON t.entry_id = e.id
+    LEFT JOIN longest l ON l.entry_id = e.id
+    LEFT JOIN current_streaks cs ON cs.entry_id = e.id
+    WHERE e.season_id = p_season_id
+  )
+  UPDATE entries e
+  SET total_wins = s.total_wins,
+      total_losses = s.total_losses,
+      longest_streak = s.longest_streak,
+      current_streak = s.current_streak,
+      status = s.status,
+      eliminated_week = s.eliminated_week,
+      is_active = s.status <> 'eliminated'
+  FROM stats s
+  WHERE e.id = s.id
+    AND (e.total_wins, e.total_losses, e.longest_streak, e.current_streak, e.status, e.eliminated_week, e.is_active)
+        IS DISTINCT FROM
+        (s.total_wins, s.total_losses, s.longest_streak, s.current_streak, s.status, s.eliminated_week, s.status <> 'eliminated');
+  GET DIAGNOSTICS v_entries_updated = ROW_COUNT;
+
+  UPDATE seasons
+  SET picks_scored_through = v_scored_through
+  WHERE id = p_season_id
+    AND picks_scored_through IS DISTINCT FROM v_scored_through;
+
+  RETURN json_build_object(
+    'picks_updated', v_picks_updated,
+    'entries_updated', v_entries_updated,
+    'scored_through', v_scored_through
+  );
+END;
+$$;
+
+-- SECURITY DEFINER se salta RLS: solo el backend (service_role) la puede llamar
+REVOKE EXECUTE ON FUNCTION public.score_season_picks(integer, integer, boolean) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.score_season_picks(integer, integer, boolean) TO service_role;
@@ -0,0 +1,8 @@
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Los módulos del backend viven en api/ (Vercel) y el payload sintético en scripts/
+sys.path.insert(0, os.path.join(ROOT, 'api'))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
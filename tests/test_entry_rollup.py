@@ -0,0 +1,349 @@
+"""
+El rollup incremental de entradas (api/_entry_rollup.py) y la función
+score_season_picks de Postgres deben dejar cada entrada igual que
+compute_entry_stats sobre todos sus picks (la reproducción completa).
+
+La parte de Python simula temporadas sintéticas corrida por corrida, como
+/auto-update-picks: picks calificados con retraso y fuera de orden,
+correcciones de marcador, filas de entradas que fallan al escribirse y
+corridas interrumpidas entre la escritura de entradas y la de picks.
+La parte de SQL aplica las migraciones sobre un Postgres embebido (pgserver)
+y además compara picks.result / points_earned de score_season_picks con
+compute_pick_result de Python; se salta si pgserver no está instalado.
+"""
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from _entry_rollup import (
+    ENTRY_STAT_FIELDS, ENTRY_ROLLUP_FIELDS, apply_new_results, compute_entry_stats, pick_order, rollup_entries
+)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'supabase', 'migrations')
+RESULTS = ('W', 'W', 'W', 'L', 'T')
+
+
+def new_entry(entry_id, with_state):
+    entry = {"id": entry_id, "total_wins": 0, "total_losses": 0, "longest_streak": 0, "current_streak": 0,
+             "status": "alive", "eliminated_week": None, "is_active": True}
+    # Sin estado = entradas creadas antes de la migración
+    entry.update({"win_run": 0, "last_scored_week": None} if with_state else {"win_run": None, "last_scored_week": None})
+    return entry
+
+
+def simulate(seed, n_entries, weeks, track_state=True):
+    """Regresa la lista de diferencias (semana, entrada, campos) contra la reproducción completa."""
+    rnd = random.Random(seed)
+    entries = {i: new_entry(i, with_state=track_state and rnd.random() < 0.9) for i in range(1, n_entries + 1)}
+    if not track_state:
+        for entry in entries.values():
+            del entry['win_run'], entry['last_scored_week']
+    picks = {}
+    outcome = {}  # pick_id -> resultado "real" del partido una vez calificado
+    next_id = 1
+    mismatches = []
+    fields = ENTRY_STAT_FIELDS + ENTRY_ROLLUP_FIELDS if track_state else ENTRY_STAT_FIELDS
+
+    def load_picks(entry_ids):
+        wanted = set(entry_ids)
+        grouped = {}
+        for pick in picks.values():
+            if pick['entry_id'] in wanted:
+                grouped.setdefault(pick['entry_id'], []).append(dict(pick))
+        return grouped
+
+    def run(failures):
+        """Una corrida de auto_update_picks. Regresa las entradas atrasadas (None si se interrumpe)."""
+        # Como score_picks: picks que cambian y algunos ya calificados sin cambio
+        # (su partido se volvió a actualizar)
+        pick_results = [
+            {"id": pick_id, "entry_id": picks[pick_id]['entry_id'], "week": picks[pick_id]['week'],
+             "previous": picks[pick_id]['result'], "result": result}
+            for pick_id, result in outcome.items()
+            if picks[pick_id]['result'] != result or rnd.random() < 0.05
+        ]
+
+        # Como auto_update_picks: entradas primero (algunas filas fallan), luego picks
+        affected = [dict(entries[entry_id]) for entry_id in sorted({p['entry_id'] for p in pick_results})]
+        changed, _ = rollup_entries(affected, pick_results, load_picks, track_state=track_state)
+        failed_ids = set()
+        for row in changed:
+            assert set(row) == {"id", *fields}
+            if failures and rnd.random() < 0.01:
+                failed_ids.add(row['id'])
+            else:
+                entries[row['id']].update(row)
+        if failures and rnd.random() < 0.05:
+            return None  # Corrida interrumpida antes de escribir los picks
+        # Los picks de entradas con error se quedan para la siguiente corrida
+        for pick_result in pick_results:
+            if pick_result['entry_id'] not in failed_ids:
+                picks[pick_result['id']]['result'] = pick_result['result']
+        return {p['entry_id'] for p in pick_results if p['entry_id'] in failed_ids}
+
+    def check(week, skip=()):
+        grouped = load_picks(entries)
+        for entry_id, entry in entries.items():
+            if entry_id in skip or track_state and entry.get('win_run') is None:
+                continue  # Sin estado: se reproduce cuando cambie un pick suyo
+            expected = compute_entry_stats(sorted(grouped.get(entry_id, []), key=pick_order))
+            diff = {field: (entry.get(field), expected[field]) for field in fields if entry.get(field) != expected[field]}
+            if diff:
+                mismatches.append((week, entry_id, diff))
+
+    for week in range(1, weeks + 1):
+        for entry_id in entries:
+            picks[next_id] = {"id": next_id, "entry_id": entry_id, "week": week, "result": "pending"}
+            next_id += 1
+
+        for _ in range(rnd.randint(1, 3)):
+            # Partidos de esta semana (la mayoría) y rezagados de semanas anteriores
+            for pick_id, pick in picks.items():
+                if pick['result'] == 'pending' and pick_id not in outcome:
+                    if pick['week'] == week and rnd.random() < 0.7 or pick['week'] < week and rnd.random() < 0.5:
+                        outcome[pick_id] = rnd.choice(RESULTS)
+            # Corrección de marcador en un pick ya calificado
+            for pick_id in rnd.sample(sorted(outcome), k=min(len(outcome), rnd.randint(0, 3))):
+                outcome[pick_id] = rnd.choice(RESULTS)
+
+            behind = run(failures=True)
+            if behind is not None:
+                # Después de cada corrida completa las entradas coinciden con sus picks,
+                # salvo las que fallaron (sus picks siguen pendientes de escribir)
+                check(week, skip=behind)
+
+    # Una corrida sin fallas al final: todas las entradas deben quedar al día
+    run(failures=False)
+    check(weeks)
+    return mismatches
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+@pytest.mark.parametrize("track_state", [True, False], ids=["con_estado", "sin_columnas_de_rollup"])
+def test_incremental_rollup_matches_full_replay(seed, track_state):
+    assert simulate(seed, n_entries=200, weeks=18, track_state=track_state) == []
+
+
+def test_elimination_stops_counting_but_not_current_streak():
+    picks = [{"id": i, "week": i, "result": r} for i, r in enumerate(['W', 'L', 'W', 'L', 'W', 'W'], start=1)]
+    stats = compute_entry_stats(picks)
+    assert (stats['total_wins'], stats['total_losses'], stats['status'], stats['eliminated_week']) == (2, 2, "eliminated", 4)
+    assert stats['current_streak'] == 2
+    assert stats['is_active'] is False
+
+
+def test_out_of_order_pick_forces_replay():
+    entry = {**compute_entry_stats([{"id": 1, "week": 3, "result": 'W'}]), "id": 1}
+    assert apply_new_results(entry, [{"id": 2, "week": 2, "result": 'W'}]) is None
+    assert apply_new_results(entry, [{"id": 3, "week": 4, "result": 'W'}])['longest_streak'] == 2
+
+
+# --- score_season_picks (Postgres) ---
+
+SCHEMA = """
+DROP SCHEMA IF EXISTS public CASCADE;
+CREATE SCHEMA public;
+DO $$ BEGIN CREATE ROLE anon; EXCEPTION WHEN duplicate_object THEN NULL; END $$;
+DO $$ BEGIN CREATE ROLE authenticated; EXCEPTION WHEN duplicate_object THEN NULL; END $$;
+DO $$ BEGIN CREATE ROLE service_role; EXCEPTION WHEN duplicate_object THEN NULL; END $$;
+CREATE TABLE seasons (id integer PRIMARY KEY, year integer, current_week integer, is_active boolean);
+CREATE TABLE matches (
+  id integer PRIMARY KEY, season_id integer, week integer, home_team_id integer, away_team_id integer,
+  game_date timestamp, home_score integer, away_score integer, status text, updated_at timestamptz
+);
+CREATE TABLE entries (
+  id integer PRIMARY KEY, season_id integer, user_id text NOT NULL, status text, is_active boolean,
+  total_wins integer, total_losses integer, current_streak integer, longest_streak integer, eliminated_week integer
+);
+CREATE TABLE picks (
+  id integer PRIMARY KEY, entry_id integer NOT NULL, season_id integer, week integer, match_id integer,
+  selected_team_id integer, created_at timestamp, result text, points_earned integer
+);
+"""
+
+
+@pytest.fixture(scope="module")
+def psql(tmp_path_factory):
+    pgserver = pytest.importorskip("pgserver")
+    server = pgserver.get_server(str(tmp_path_factory.mktemp("pgdata")), cleanup_mode='stop')
+
+    def run(sql):
+        out = server.psql(sql)
+        assert 'ERROR' not in out, out
+        return out
+
+    run(SCHEMA)
+    for name in sorted(os.listdir(MIGRATIONS_DIR)):
+        if name >= "20261017000300":  # Las anteriores son constraints de otras tablas
+            with open(os.path.join(MIGRATIONS_DIR, name), encoding='utf-8') as f:
+                run(f.read())
+    return run
+
+
+def query_json(psql, sql):
+    return json.loads(psql(f"COPY (SELECT coalesce(json_agg(row_to_json(q)), '[]') FROM ({sql}) q) TO STDOUT;"))
+
+
+def sql_literal(value):
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def insert_rows(psql, table, rows):
+    columns = list(rows[0])
+    values = ",".join("(" + ",".join(sql_literal(row[c]) for c in columns) + ")" for row in rows)
+    psql(f"INSERT INTO {table} ({','.join(columns)}) VALUES {values};")
+
+
+def seed_sql_season(psql, rnd, n_entries=60, weeks=8):
+    psql("TRUNCATE seasons, matches, entries, picks; INSERT INTO seasons (id, year, current_week, is_active) VALUES (1, 2025, 1, true);")
+    matches = []
+    for week in range(1, weeks + 1):
+        teams = list(range(1, 9))
+        rnd.shuffle(teams)
+        kickoff = datetime(2025, 9, 7, 18) + timedelta(days=7 * (week - 1))
+        for i in range(0, len(teams), 2):
+            matches.append({"id": len(matches) + 1, "season_id": 1, "week": week, "home_team_id": teams[i],
+                            "away_team_id": teams[i + 1], "game_date": kickoff.isoformat(), "home_score": None,
+                            "away_score": None, "status": "scheduled", "updated_at": "2025-09-01T00:00:00+00:00"})
+    entries = [{"id": i, "season_id": 1, "user_id": f"u{i}", "status": "alive", "is_active": True, "total_wins": 0,
+                "total_losses": 0, "current_streak": 0, "longest_streak": 0, "eliminated_week": None}
+               for i in range(1, n_entries + 1)]
+    picks = []
+    for entry in entries:
+        for week in range(1, weeks + 1):
+            match = rnd.choice([m for m in matches if m['week'] == week])
+            created = datetime.fromisoformat(match['game_date']) - timedelta(hours=rnd.choice([0.5, 2, 30]))
+            picks.append({"id": len(picks) + 1, "entry_id": entry['id'], "season_id": 1, "week": week,
+                          "match_id": match['id'], "selected_team_id": rnd.choice([match['home_team_id'], match['away_team_id']]),
+                          "created_at": created.isoformat(), "result": "pending", "points_earned": None})
+    insert_rows(psql, "matches", matches)
+    insert_rows(psql, "entries", entries)
+    insert_rows(psql, "picks", picks)
+    return matches
+
+
+def assert_entries_match_replay(psql):
+    picks_by_entry = {}
+    for pick in query_json(psql, "SELECT id, entry_id, week, result FROM picks"):
+        picks_by_entry.setdefault(pick['entry_id'], []).append(pick)
+    fields = ENTRY_STAT_FIELDS + ENTRY_ROLLUP_FIELDS
+    mismatches = []
+    for entry in query_json(psql, "SELECT * FROM entries"):
+        expected = compute_entry_stats(sorted(picks_by_entry.get(entry['id'], []), key=pick_order))
+        diff = {field: (entry[field], expected[field]) for field in fields if entry[field] != expected[field]}
+        if diff:
+            mismatches.append((entry['id'], diff))
+    assert mismatches == []
+
+
+def score(psql, week, full=False):
+    out = psql(f"SELECT score_season_picks(1, {week}, {'true' if full else 'false'});")
+    return json.loads(out.strip().splitlines()[2])
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_sql_incremental_scoring_matches_full_replay(psql, seed):
+    rnd = random.Random(seed)
+    matches = seed_sql_season(psql, rnd)
+    completed = []
+    weeks = max(m['week'] for m in matches)
+
+    for week in range(1, weeks + 1):
+        for _ in range(rnd.randint(1, 2)):
+            # Partidos de la semana (y rezagados) que terminan; alguna corrección de marcador
+            finishing = [m for m in matches if m['week'] <= week and m['id'] not in completed and rnd.random() < 0.7]
+            corrections = rnd.sample(completed, k=min(len(completed), rnd.randint(0, 2)))
+            for match in finishing:
+                completed.append(match['id'])
+            for match_id in [m['id'] for m in finishing] + corrections:
+                home, away = rnd.randint(0, 35), rnd.randint(0, 35)
+                psql(f"UPDATE matches SET home_score = {home}, away_score = {away}, status = 'completed', "
+                     f"updated_at = now() WHERE id = {match_id};")
+            score(psql, week)
+            assert_entries_match_replay(psql)
+
+    # La marca incremental no dejó nada atrás: una auditoría completa no cambia nada
+    audit = score(psql, weeks, full=True)
+    assert (audit['picks_updated'], audit['entries_updated']) == (0, 0)
+
+
+def test_sql_function_is_service_role_only(psql):
+    grants = query_json(psql, """
+        SELECT r.rolname, has_function_privilege(r.rolname, 'public.score_season_picks(integer, integer, boolean)', 'EXECUTE') AS allowed
+        FROM pg_roles r WHERE r.rolname IN ('anon', 'authenticated', 'service_role')
+    """)
+    assert {row['rolname']: row['allowed'] for row in grants} == {"anon": False, "authenticated": False, "service_role": True}
+
+
+def test_sql_score_edit_without_updated_at_is_rescored(psql):
+    rnd = random.Random(5)
+    seed_sql_season(psql, rnd, n_entries=20, weeks=2)
+    psql("UPDATE matches SET home_score = 21, away_score = 7, status = 'completed' WHERE week = 1;")
+    first = score(psql, 2)
+    # La marca queda detrás de now() aunque los partidos se acaben de escribir
+    lagging = query_json(psql, f"SELECT '{first['scored_through']}'::timestamptz <= now() - interval '5 minutes' AS ok")
+    assert lagging == [{"ok": True}]
+
+    # Corrección de marcador como la hace el frontend (sin tocar updated_at): el trigger lo mueve
+    psql("UPDATE matches SET home_score = 7, away_score = 21 WHERE week = 1;")
+    second = score(psql, 2)
+    assert second['picks_updated'] > 0
+    assert_entries_match_replay(psql)
+    stale = query_json(psql, """
+        SELECT p.id FROM picks p JOIN matches m ON m.id = p.match_id
+        WHERE m.week = 1 AND p.result <> CASE WHEN p.selected_team_id = m.away_team_id THEN 'W' ELSE 'L' END
+    """)
+    assert stale == []
+
+
+# Horas de anticipación del pick: después del partido, en punto, minutos antes,
+# justo abajo / en / arriba de 1 h y varias horas antes
+PICK_LEAD_HOURS = (-2, 0, 0.5, 1 - 1 / 3600, 1, 1 + 1 / 3600, 2.5, 30)
+
+
+def test_sql_pick_results_match_python_scoring(psql):
+    index = pytest.importorskip("index")  # compute_pick_result vive en api/index.py
+    psql("TRUNCATE seasons, matches, entries, picks; INSERT INTO seasons (id, year, current_week, is_active) VALUES (1, 2025, 1, true);")
+    kickoff = datetime(2025, 9, 7, 18)
+    scores = [(24, 17), (10, 27), (20, 20), (None, None), (14, 3)]  # local gana, visita gana, empate, sin marcador
+    matches = [{"id": i + 1, "season_id": 1, "week": 1, "home_team_id": 2 * i + 1, "away_team_id": 2 * i + 2,
+                "game_date": kickoff.isoformat(), "home_score": home, "away_score": away,
+                "status": "scheduled" if i == len(scores) - 1 else "completed", "updated_at": "2025-09-08T00:00:00+00:00"}
+               for i, (home, away) in enumerate(scores)]
+    entries, picks = [], []
+    for match in matches:
+        for team_id in (match['home_team_id'], match['away_team_id']):
+            for hours in PICK_LEAD_HOURS:
+                entry_id = len(entries) + 1
+                entries.append({"id": entry_id, "season_id": 1, "user_id": f"u{entry_id}", "status": "alive", "is_active": True,
+                                "total_wins": 0, "total_losses": 0, "current_streak": 0, "longest_streak": 0, "eliminated_week": None})
+                created = kickoff - timedelta(seconds=round(hours * 3600))
+                picks.append({"id": len(picks) + 1, "entry_id": entry_id, "season_id": 1, "week": 1, "match_id": match['id'],
+                              "selected_team_id": team_id, "created_at": created.isoformat(), "result": "pending",
+                              "points_earned": None})
+    insert_rows(psql, "matches", matches)
+    insert_rows(psql, "entries", entries)
+    insert_rows(psql, "picks", picks)
+
+    score(psql, 1, full=True)
+
+    matches_by_id = {m['id']: m for m in query_json(psql, "SELECT * FROM matches")}
+    mismatches = []
+    for pick in query_json(psql, "SELECT * FROM picks ORDER BY id"):
+        result, points_earned = index.compute_pick_result(pick, matches_by_id[pick['match_id']])
+        stored = (pick['result'], pick['points_earned'] if result != 'pending' else None)
+        if stored != (result, points_earned if result != 'pending' else None):
+            mismatches.append((pick['id'], pick['created_at'], stored, (result, points_earned)))
+    assert mismatches == []
+    # Los casos límite sí se cubrieron
+    results = {pick['result'] for pick in query_json(psql, "SELECT result FROM picks")}
+    assert results == {'W', 'L', 'T', 'pending'}
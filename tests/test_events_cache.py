@@ -0,0 +1,54 @@
+"""Copias vencidas de SeasonEventsCache (api/_nfl_cache.py) cuando la descarga falla."""
+import pytest
+import requests
+
+from _nfl_cache import SeasonEventsCache
+
+
+class FlakyClient:
+    def __init__(self):
+        self.down = False
+
+    def events(self, year):
+        if self.down:
+            raise requests.exceptions.ConnectionError("RapidAPI caído")
+        return {"events": [{"id": "1"}], "leagues": []}
+
+
+def expire(cache, year, seconds_ago):
+    fetched_at, data = cache._entries[year]
+    cache._entries[year] = (fetched_at - seconds_ago, data)
+
+
+def test_recently_expired_copy_is_served_marked_stale():
+    client = FlakyClient()
+    cache = SeasonEventsCache(client, ttl_seconds=10, max_stale_seconds=60)
+    cache.get(2025)
+    expire(cache, 2025, 30)
+    client.down = True
+
+    data = cache.get(2025)
+
+    assert data["stale"] is True and data["age_seconds"] >= 30
+    assert data["events"] == [{"id": "1"}]
+
+
+def test_copy_past_the_stale_cap_is_not_served():
+    client = FlakyClient()
+    cache = SeasonEventsCache(client, ttl_seconds=10, max_stale_seconds=60)
+    cache.get(2025)
+    expire(cache, 2025, 120)
+    client.down = True
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        cache.get(2025)
+
+
+def test_write_paths_never_get_a_stale_copy():
+    client = FlakyClient()
+    cache = SeasonEventsCache(client, ttl_seconds=10, max_stale_seconds=60)
+    cache.get(2025)
+    client.down = True
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        cache.get(2025, refresh=True, allow_stale=False)
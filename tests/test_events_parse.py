@@ -0,0 +1,63 @@
+"""
+El parseo en streaming de /nfl-events (NFLClient.events_compact) debe dejar
+los mismos campos que usan update_matches y update_weekly_odds que
+response.json() sobre el payload completo, sin importar dónde se corten los chunks.
+"""
+import json
+
+import pytest
+
+from _nfl_events import parse_events_stream
+from rapidapi_standin import synthetic_events_payload
+
+
+@pytest.fixture(scope="module")
+def raw_payload():
+    return json.dumps(synthetic_events_payload(2025, filler_kb=2)).encode('utf-8')
+
+
+def chunked(raw, size):
+    return (raw[i:i + size] for i in range(0, len(raw), size))
+
+
+def used_fields(event):
+    competition = event['competitions'][0]
+    return (
+        event['id'],
+        event['date'],
+        event['season']['type'],
+        event['week']['number'],
+        competition['status']['type']['completed'],
+        tuple(
+            (c['homeAway'], c.get('score'), c['team']['abbreviation'], c['team']['location'],
+             c['team']['name'], c['team']['displayName'])
+            for c in competition['competitors']
+        )
+    )
+
+
+@pytest.mark.parametrize("chunk_size", [7, 1024, 64 * 1024])
+def test_streaming_matches_full_parse(raw_payload, chunk_size):
+    full = json.loads(raw_payload)
+    compact = parse_events_stream(chunked(raw_payload, chunk_size))
+
+    assert len(compact['events']) == len(full['events'])
+    assert [used_fields(e) for e in compact['events']] == [used_fields(e) for e in full['events']]
+    # Las demás claves de nivel superior se conservan tal cual
+    assert {k: v for k, v in compact.items() if k != 'events'} == {k: v for k, v in full.items() if k != 'events'}
+
+
+def test_multibyte_characters_split_across_chunks():
+    document = {"events": [{"id": "1", "date": "2025-09-07T17:00Z", "name": "Señales – ñandú"}], "leagues": ["NFL ñ"]}
+    raw = json.dumps(document, ensure_ascii=False).encode('utf-8')
+
+    parsed = parse_events_stream(chunked(raw, 1))
+
+    assert parsed['events'][0]['date'] == "2025-09-07T17:00Z"
+    assert parsed['leagues'] == ["NFL ñ"]
+
+
+def test_empty_and_invalid_documents():
+    assert parse_events_stream([b'{"events": []}']) == {'events': []}
+    with pytest.raises(ValueError):
+        parse_events_stream([b'{"events": [{"id": 1} {"id": 2}]}'])
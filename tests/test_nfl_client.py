@@ -0,0 +1,57 @@
+"""Hedged requests de NFLClient (api/_nfl_client.py) con un upstream simulado."""
+import threading
+import time
+
+import requests
+
+from _nfl_client import NFLClient, fan_out
+from _rate_limit import TokenBucketRateLimiter
+
+
+class FakeSession:
+    """Upstream con latencia fija; slow_first hace que el primer request tarde más."""
+
+    def __init__(self, latency=0.1, slow_first=None):
+        self.latency = latency
+        self.slow_first = slow_first
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None, stream=False):
+        with self._lock:
+            self.calls += 1
+            first = self.calls == 1
+        time.sleep(self.slow_first if first and self.slow_first else self.latency)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"items": []}'
+        return response
+
+
+def make_client(session, rate_limiter):
+    client = NFLClient("test-key", rate_limiter=rate_limiter)
+    client.session = session
+    for _ in range(25):
+        client._tracker("/nfl-eventodds").record(session.latency)
+    return client
+
+
+def test_queueing_in_the_rate_limiter_does_not_fire_hedges():
+    session = FakeSession(latency=0.1)
+    client = make_client(session, TokenBucketRateLimiter(rate_per_second=5))
+
+    fan_out(lambda event_id: client.event_odds(event_id), range(16), max_concurrency=8)
+
+    assert session.calls == 16
+    assert client.hedges_fired == 0
+
+
+def test_slow_upstream_fires_a_hedge():
+    session = FakeSession(latency=0.05, slow_first=1.0)
+    client = make_client(session, TokenBucketRateLimiter(rate_per_second=20, burst=5))
+
+    started = time.monotonic()
+    client.event_odds(1)
+
+    assert client.hedges_fired == 1 and client.hedges_won == 1
+    assert time.monotonic() - started < 0.9
@@ -0,0 +1,27 @@
+"""Cuota mensual del TokenBucketRateLimiter (api/_rate_limit.py)."""
+import time
+
+import pytest
+
+from _rate_limit import RateLimitExceeded, TokenBucketRateLimiter
+
+
+def test_configured_monthly_quota_is_enforced():
+    limiter = TokenBucketRateLimiter(rate_per_second=100, monthly_quota=2)
+    limiter.acquire()
+    limiter.acquire()
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire()
+    # Sin header de reset se asume el inicio del mes siguiente
+    assert limiter.status()['quota_reset_seconds'] > 0
+
+
+def test_exhausted_quota_renews_after_reset():
+    limiter = TokenBucketRateLimiter(rate_per_second=100, monthly_quota=10)
+    limiter.update_from_headers({'X-RateLimit-Requests-Remaining': '0', 'X-RateLimit-Requests-Reset': '0.2'})
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire()
+
+    time.sleep(0.3)
+    limiter.acquire()
+    assert limiter.status()['monthly_remaining'] == 9